@@ -1,5 +1,5 @@
 from utils import read_data
-from advent2019_day07_intcode import run_tape, run_sequence, run_sequence_with_feedback
+from intcode import find_best_sequence, run_sequence_with_feedback
 from itertools import permutations
 
 DATA = [int(x) for x in read_data().split(",")]
@@ -15,17 +15,13 @@ SAMPLE_FIVE = [int(x) for x in "3,52,1001,52,-5,52,3,53,1,52,56,54,1007,54,5,55,
                                "56,1005,56,6,99,0,0,0,0,10".split(",")]
 
 if __name__ == '__main__':
-    max_output = 0
     # output = run_sequence(SAMPLE_ONE, [4,3,2,1,0])
     # output = run_sequence(SAMPLE_TWO, [0,1,2,3,4])
     # output = run_sequence(SAMPLE_THREE, [1,0,4,3,2])
     # output = run_sequence_with_feedback(SAMPLE_FOUR, [9,8,7,6,5])
     # output = run_sequence_with_feedback(SAMPLE_FIVE, [9,7,8,5,6])
 
-    for amp_order in permutations([0, 1, 2, 3, 4]):
-        output = run_sequence(DATA, amp_order)
-        if output > max_output:
-            max_output = output
+    max_output, _ = find_best_sequence(DATA, [0, 1, 2, 3, 4])
     print(f"Stage one max output is {max_output}")
 
     max_output = 0
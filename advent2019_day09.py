@@ -1,5 +1,5 @@
 from utils import read_data
-from advent2019_day09_intcode import run_tape, pretty_print_tape
+from intcode import run_tape, pretty_print_tape, PrintOutput
 
 DATA = [int(x) for x in read_data().split(",")]
 SAMPLE_ONE = [int(x) for x in "109,1,204,-1,1001,100,1,100,1008,100,16,101,1006,101,0,99".split(",")]
@@ -8,5 +8,5 @@ SAMPLE_THREE = [int(x) for x in "104,1125899906842624,99".split(",")]
 
 if __name__ == '__main__':
     pretty_print_tape(DATA)
-    run_tape(DATA, [1])
-    run_tape(DATA, [2])
+    run_tape(DATA, [1], output=PrintOutput())
+    run_tape(DATA, [2], output=PrintOutput(), compiled=True)
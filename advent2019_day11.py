@@ -1,7 +1,7 @@
 from utils import read_data
 from pathlib import Path
 from typing import NamedTuple, List
-from advent2019_day11_intcode import run_tape_generator
+from intcode import run_tape_generator
 from collections import defaultdict
 import numpy as np
 
@@ -32,12 +32,12 @@ def run_painter(tape: List[int], initial_square=PANEL_BLACK):
     curloc = Coord(0, 0)
     curdir = '^'
     field[curloc] = initial_square
-    program = run_tape_generator(tape)
+    program = run_tape_generator(tape, num_outputs=2)
     # Initialize the generator so it's ready to accept input
     next(program)
     while True:
         try:
-            color, direction = program.send(field[curloc])
+            color, direction = program.send([field[curloc]])
         except StopIteration:
             break
         field[curloc] = color
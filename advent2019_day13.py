@@ -1,5 +1,5 @@
 from utils import read_data
-from advent2019_day13_intcode import run_tape_generator
+from intcode import run_tape_generator
 import numpy as np
 import curses
 import sys
@@ -46,7 +46,7 @@ def part_one(data, size):
     pos_x = pos_y = tile_id = 0
     while True:
         try:
-            pos_x, pos_y, tile_id = program.send(0)
+            pos_x, pos_y, tile_id = program.send([0])
         except StopIteration:
             break
         screen[pos_y, pos_x] = tile_id
@@ -75,7 +75,7 @@ def part_two(data):
     paddle_input = 0
     while True:
         try:
-            pos_x, pos_y, tile_id = program.send(paddle_input)
+            pos_x, pos_y, tile_id = program.send([paddle_input])
         except StopIteration:
             break
         if pos_x == -1 and pos_y == 0:
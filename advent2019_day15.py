@@ -1,5 +1,5 @@
 from utils import read_data
-from advent2019_day15_intcode import run_tape_generator
+from intcode import run_tape_generator
 from typing import NamedTuple, Generator, Dict, Tuple, Union
 import numpy as np
 from readchar import readkey
@@ -151,7 +151,7 @@ def process_result(discovered_map, steps_map, droid_pos, command, result):
 
 
 def execute_command(program: Generator[int, int, None], direction: str) -> int:
-    return program.send(DIRECTION_NUMS[direction])
+    return program.send([DIRECTION_NUMS[direction]])
 
 
 def clear_screen():
@@ -1,5 +1,5 @@
 from utils import read_data
-from advent2019_day17_intcode import run_tape_generator, run_tape
+from intcode import IntcodeVM, decode_ascii, AsciiTerminal, run_ascii
 from typing import NamedTuple
 
 
@@ -11,14 +11,9 @@ class Coord(NamedTuple):
         return self.y * self.x
 
 
-def get_view(program):
-    outstr = ""
-    while True:
-        try:
-            outstr += chr(program.send(0)[0])
-        except StopIteration:
-            break
-    return outstr
+def get_view(program: IntcodeVM):
+    # The camera prints its whole frame and halts, so collect it all at once
+    return decode_ascii(program.run_until_input_or_halt()).decode("ascii")
 
 
 def detect_intersections(picture):
@@ -41,9 +36,7 @@ def detect_intersections(picture):
 
 DATA = [int(x) for x in read_data().split(",")]
 
-camera = run_tape_generator(DATA, num_outputs=1)
-next(camera)
-
+camera = IntcodeVM(DATA)
 camera_view = get_view(camera).split("\n")
 all_intersections = detect_intersections(camera_view)
 print("\n".join(camera_view))
@@ -64,13 +57,15 @@ DATA[0] = 2
 #
 # Factoring program C out:
 # <B>,<C>,<B>,<C>,<B>,<A>,<C>,<A>,<B>,<A>
-part2_input = [ord(x) for x in """B,C,B,C,B,A,C,A,B,A
+robot = AsciiTerminal(echo=False)
+robot.feed("""B,C,B,C,B,A,C,A,B,A
 L,10,R,10,R,6,L,4
 L,10,L,12,R,6
 R,10,L,4,L,4,L,12
 n
-"""]
-_, _, dust_amount, _ = run_tape(DATA, part2_input)
+""")
+# The robot reports the dust it collected as the one output that isn't ASCII
+dust_amount = run_ascii(DATA, robot)[-1]
 print(f"Dust amount: {dust_amount}")
 
 
@@ -1,10 +1,16 @@
 from utils import read_data
-from advent2019_day19_intcode import run_tape_generator
+from intcode import IntcodeVM
+from intcode.batch import run_batch
 from typing import NamedTuple, Dict, Union, Set
 import numpy as np
 
 DATA = [int(x) for x in read_data().split(",")]
 
+# Every probe starts the same way, so run the detector up to its first input once and fork from there
+DETECTOR = IntcodeVM(DATA)
+DETECTOR.run()
+DETECTOR_READY = DETECTOR.snapshot()
+
 
 class Coord(NamedTuple):
     y: int
@@ -19,16 +25,15 @@ def print_grid(to_print):
 
 
 def get_value_at_location(loc):
-    detector = run_tape_generator(DATA, num_outputs=1)
-    next(detector)
-    return detector.send([loc.x, loc.y])[0]
+    detector = DETECTOR_READY.fork()
+    return detector.run_until_output([loc.x, loc.y])
 
 
 def part_one():
-    grid = np.zeros((50, 50), dtype=int)
-
-    for y, x in np.ndindex(grid.shape):
-        grid[y, x] = get_value_at_location(Coord(y=y, x=x))
+    # Probe the whole grid in one batch, with one (x, y) input row per square
+    ys, xs = np.indices((50, 50))
+    probes = np.stack([xs.ravel(), ys.ravel()], axis=1)
+    grid = run_batch(DATA, probes)[:, 0].reshape(50, 50)
     #print_grid(grid)
     return np.count_nonzero(grid == 1)
 
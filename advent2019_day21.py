@@ -1,9 +1,16 @@
 from utils import read_data
-from advent2019_day21_intcode import run_tape
+from intcode import AsciiTerminal, run_ascii
 
 DATA = [int(x) for x in read_data().split(",")]
 
 
+def run_springscript(data, script):
+    terminal = AsciiTerminal()
+    terminal.feed(script)
+    # The droid's report on the hull damage is the one value that isn't ASCII
+    return run_ascii(data, terminal)[-1]
+
+
 def part_one(data):
     input = """NOT A J
 NOT B T
@@ -12,9 +19,8 @@ NOT C T
 OR T J
 AND D J
 WALK
-    """
-    _, _, output, _ = run_tape(DATA, [ord(x) for x in input])
-    return output
+"""
+    return run_springscript(data, input)
 
 
 def part_two(data):
@@ -29,9 +35,8 @@ NOT T T
 OR E T
 AND T J
 RUN
-    """
-    _, _, output, _ = run_tape(data, [ord(x) for x in input])
-    return output
+"""
+    return run_springscript(data, input)
 
 
 print(f"Hull damage from part one: {part_one(DATA)}")
@@ -1,62 +1,67 @@
 from utils import read_data
-from advent2019_day23_intcode import run_tape_multithreaded, Packet
-from multiprocessing import Queue, Process
-from queue import Empty
-from typing import NamedTuple, List
-import time
+from intcode import RoundRobinScheduler, RingRouter
+from typing import NamedTuple
 
-def part_one(data, num_entities=50):
-    network_inputs: List[Queue] = []
-    processes: List[Process] = []
-    output_queue = Queue()
 
-    for i in range(num_entities):
-        print(f"Starting process {i}/{num_entities}")
-        network_inputs.append(Queue())
-        new_process = Process(target=run_tape_multithreaded, args=(data, i, network_inputs[i], output_queue, 3))
-        processes.append(new_process)
-        new_process.start()
+class Packet(NamedTuple):
+    dest: int
+    x: int
+    y: int
 
+
+def start_network(data, num_entities, rings=False):
+    # Every NIC gets its address as its first input, reads -1 while its queue is empty, and sends dest/x/y triples.
+    # With rings, each NIC runs in its own process instead, talking to the router through shared memory.
+    if rings:
+        return RingRouter(data, num_entities, idle_value=-1, message_type=Packet)
+    return RoundRobinScheduler.from_program(data, num_entities, idle_value=-1, message_length=3, message_type=Packet)
+
+
+def part_one(data, num_entities=50, rings=False):
+    network = start_network(data, num_entities, rings)
+    try:
+        return first_nat_packet(network).y
+    finally:
+        if rings:
+            network.close()
+
+
+def part_two(data, num_entities=50, rings=False):
+    network = start_network(data, num_entities, rings)
+    try:
+        return repeated_nat_packet(network)
+    finally:
+        if rings:
+            network.close()
+
+
+def first_nat_packet(network):
     while True:
-        packet = output_queue.get(block=True)
-        # print(f"Processing packet {packet}")
-        if packet.dest == 255:
-            [x.kill() for x in processes]
-            return packet.y
-        network_inputs[packet.dest].put((packet.x, packet.y))
+        for _, packet in network.run_round():
+            # print(f"Processing packet {packet}")
+            if packet.dest == 255:
+                return packet
+            network.send(packet.dest, (packet.x, packet.y))
 
 
-def part_two(data, num_entities=50):
-    network_inputs: List[Queue] = []
-    processes: List[Process] = []
-    output_queue = Queue()
+def repeated_nat_packet(network):
     nat_buffer = None
     previous_sent_nat_packet = None
 
-    for i in range(num_entities):
-        print(f"Starting process {i}/{num_entities}")
-        network_inputs.append(Queue())
-        new_process = Process(target=run_tape_multithreaded, args=(data, i, network_inputs[i], output_queue, 3))
-        processes.append(new_process)
-        new_process.start()
-
     while True:
-        try:
-            # Give the workers time to starve before checking input queues
-            packet = output_queue.get(block=True, timeout=0.3)
-        except Empty:
-            if all(x.empty() for x in network_inputs):
-                if previous_sent_nat_packet is not None and previous_sent_nat_packet == nat_buffer:
-                    [x.kill() for x in processes]
-                    return nat_buffer
-                network_inputs[0].put((nat_buffer.x, nat_buffer.y))
-                previous_sent_nat_packet = nat_buffer
-                continue
-        # print(f"Processing packet {packet}")
-        if packet.dest == 255:
-            nat_buffer = packet
-        else:
-            network_inputs[packet.dest].put((packet.x, packet.y))
+        packets = network.run_round()
+        for _, packet in packets:
+            # print(f"Processing packet {packet}")
+            if packet.dest == 255:
+                nat_buffer = packet
+            else:
+                network.send(packet.dest, (packet.x, packet.y))
+        # Every NIC is asleep, having polled an empty queue twice running without sending anything since
+        if network.idle and nat_buffer is not None:
+            if previous_sent_nat_packet is not None and previous_sent_nat_packet == nat_buffer:
+                return nat_buffer
+            network.send(0, (nat_buffer.x, nat_buffer.y))
+            previous_sent_nat_packet = nat_buffer
 
 
 if __name__ == '__main__':
@@ -1,6 +1,6 @@
 from utils import read_data
-from advent2019_day25_intcode import run_tape_multithreaded
-from multiprocessing import Process, Queue
+from intcode import AsyncIntcodeVM, AsciiTerminal
+import asyncio
 
 
 DATA = [int(x) for x in read_data().split(",")]
@@ -11,15 +11,33 @@ DATA = [int(x) for x in read_data().split(",")]
 # - antenna
 # - astronaut ice cream
 
-if __name__ == '__main__':
-    input_queue = Queue()
-    text_adv = Process(target=run_tape_multithreaded, args=(DATA, input_queue))
-    text_adv.start()
 
+async def show(screen: asyncio.Queue):
+    display = AsciiTerminal()
     while True:
-        command = input() + "\n"
+        # The terminal writes out whole lines as they finish, and the "Command?" prompt ends with a newline too
+        display.write(await screen.get())
+        for value in display.results:
+            print(f"Unknown value: {value}")
+        display.results.clear()
+
+
+async def main():
+    commands = asyncio.Queue()
+    screen = asyncio.Queue()
+    text_adv = asyncio.create_task(AsyncIntcodeVM(DATA, commands, screen).run())
+    display = asyncio.create_task(show(screen))
+    loop = asyncio.get_running_loop()
+
+    while not text_adv.done():
+        # input() blocks, so run it off to the side while the adventure keeps going
+        command = await loop.run_in_executor(None, input) + "\n"
         if command == "exit_simulation\n":
-            text_adv.kill()
-            exit()
-        else:
-            input_queue.put(command)
+            break
+        await commands.put(command)
+    text_adv.cancel()
+    display.cancel()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,77 @@
+from pathlib import Path
+from collections import defaultdict, deque
+from intcode import process_instruction, execute, load_tape
+from intcode.decode import InstructionCache
+from intcode.compiler import compile_tape
+from intcode.jit import trace_tape
+import time
+
+# Day 9's BOOST program in sensor boost mode (input 2) is the heaviest single-VM workload we have
+BOOST_PROGRAM = [int(x) for x in Path('inputs/advent2019_day09_input.txt').read_text().split(",")]
+BOOST_INPUT = 2
+
+
+def run_old_dispatch(tape, input_values):
+    tmptape = defaultdict(int, {x[0]: x[1] for x in enumerate(tape)})
+    curpos = 0
+    relative_base = 0
+    read_input = deque(input_values).popleft
+    num_instructions = 0
+    while curpos is not None:
+        curpos, completed_instruction = process_instruction(tmptape, curpos, read_input, relative_base)
+        if completed_instruction.relative_adjustment_amount is not None:
+            relative_base += completed_instruction.relative_adjustment_amount
+        num_instructions += 1
+    return num_instructions
+
+
+def run_new_dispatch(tape, input_values):
+    tmptape = load_tape(tape)
+    curpos = 0
+    relative_base = 0
+    cache = InstructionCache(tmptape)
+    input_iter = iter(input_values)
+    while curpos is not None:
+        curpos, relative_base, _ = execute(tmptape, curpos, relative_base, input_iter.__next__, cache)
+
+
+def run_compiled(tape, input_values):
+    machine = compile_tape(tape)
+    curpos = 0
+    relative_base = 0
+    input_iter = iter(input_values)
+    while curpos is not None:
+        curpos, relative_base, _ = machine.execute(curpos, relative_base, input_iter.__next__)
+
+
+def run_traced(tape, input_values):
+    machine = trace_tape(tape)
+    curpos = 0
+    relative_base = 0
+    input_iter = iter(input_values)
+    while curpos is not None:
+        curpos, relative_base, _ = machine.execute(curpos, relative_base, input_iter.__next__)
+    return len(machine.traces)
+
+
+def time_run(runner, *args):
+    start = time.perf_counter()
+    result = runner(*args)
+    return time.perf_counter() - start, result
+
+
+if __name__ == '__main__':
+    old_time, num_instructions = time_run(run_old_dispatch, BOOST_PROGRAM, [BOOST_INPUT])
+    new_time, _ = time_run(run_new_dispatch, BOOST_PROGRAM, [BOOST_INPUT])
+    compile_time, _ = time_run(compile_tape, BOOST_PROGRAM)
+    compiled_time, _ = time_run(run_compiled, BOOST_PROGRAM, [BOOST_INPUT])
+    traced_time, num_traces = time_run(run_traced, BOOST_PROGRAM, [BOOST_INPUT])
+    print(f"BOOST mode {BOOST_INPUT}: {num_instructions} instructions")
+    print(f"OpCodeBase dispatch: {old_time:.3f}s, {num_instructions / old_time:,.0f} instructions/sec")
+    print(f"Inline dispatch:     {new_time:.3f}s, {num_instructions / new_time:,.0f} instructions/sec")
+    print(f"Compiled blocks:     {compiled_time:.3f}s, {num_instructions / compiled_time:,.0f} instructions/sec "
+          f"(plus {compile_time:.3f}s compiling)")
+    print(f"Traced hot loops:    {traced_time:.3f}s, {num_instructions / traced_time:,.0f} instructions/sec "
+          f"({num_traces} traces)")
+    print(f"Speedup: {old_time / new_time:.1f}x inline, {old_time / compiled_time:.1f}x compiled, "
+          f"{old_time / traced_time:.1f}x traced")
@@ -0,0 +1,13 @@
+from intcode.opcodes import OPCODES, OpCodeBase, process_instruction, pretty_print_instruction, pretty_print_tape
+from intcode.vm import execute, IntcodeVM, VMSnapshot, VMStatus, RUNNING, NEEDS_INPUT, OUTPUT_READY, HALTED
+from intcode.memory import load_tape, grow_memory
+from intcode.decode import InstructionCache
+from intcode.io import InputExhausted, QueueInput, AsciiInput, decode_ascii, PrintOutput, AsciiTerminal, QueueOutput
+from intcode.runners import load_program, run_tape, run_tape_with_output_stop, run_tape_generator, \
+    run_tape_multithreaded, run_ascii
+from intcode.compiler import BlockCompiler, compile_tape
+from intcode.jit import TracingJIT, trace_tape
+from intcode.scheduler import RoundRobinScheduler
+from intcode.rings import PacketRing, RingRouter
+from intcode.asyncvm import AsyncIntcodeVM
+from intcode.amplifiers import run_sequence, find_best_sequence, run_sequence_with_feedback
@@ -0,0 +1,71 @@
+from intcode.vm import IntcodeVM
+
+
+def ready_amp(tape):
+    # Every amp runs the same program, so get it to the phase setting input once and fork one copy per amp
+    amp = IntcodeVM(tape)
+    amp.run()
+    return amp.snapshot()
+
+
+def run_sequence(tape, sequence):
+    amp_ready = ready_amp(tape)
+    current_input = 0
+    amp_output = None
+    for amp in sequence:
+        amp_output = amp_ready.fork().run_until_output([amp, current_input])
+        current_input = amp_output
+    return amp_output
+
+
+def find_best_sequence(tape, phases, num_amps=None, initial_input=0):
+    """
+    Finds the ordering of phase settings for a chain of num_amps amplifiers (default: one per phase) that gives the
+    highest final output, and returns (output, sequence).
+
+    Orderings are walked as a trie, so orderings that share a prefix share the amps they have in common, and each
+    (phase, input signal) pair is only ever run once no matter how many branches reach it.
+    """
+    if num_amps is None:
+        num_amps = len(phases)
+    amp_ready = ready_amp(tape)
+    amp_outputs = {}
+    best_output, best_sequence = None, None
+    to_visit = [((), initial_input)]
+    while to_visit:
+        sequence, signal = to_visit.pop()
+        if len(sequence) == num_amps:
+            if best_output is None or signal > best_output:
+                best_output, best_sequence = signal, sequence
+            continue
+        for phase in phases:
+            if phase in sequence:
+                continue
+            if (phase, signal) not in amp_outputs:
+                amp_outputs[(phase, signal)] = amp_ready.fork().run_until_output([phase, signal])
+            to_visit.append((sequence + (phase,), amp_outputs[(phase, signal)]))
+    return best_output, best_sequence
+
+
+def run_sequence_with_feedback(tape, sequence, initial_input=0):
+    """
+    Runs a ring of amplifiers, one per phase setting in sequence, feeding each one's outputs to the next until they
+    stop producing any.  Returns the last value the final amp output.
+
+    Each amp is a persistent IntcodeVM that pauses when it runs out of input and picks up in place when the previous
+    amp hands it more, so a round costs the same no matter how big the program is, and long chains stay cheap.
+    """
+    amp_ready = ready_amp(tape)
+    amps = []
+    for phase in sequence:
+        amp = amp_ready.fork()
+        amp.feed([phase])
+        amps.append(amp)
+    signals = [initial_input]
+    final_output = None
+    while signals:
+        for amp in amps:
+            signals = amp.run(signals)
+        if signals:
+            final_output = signals[-1]
+    return final_output
@@ -0,0 +1,74 @@
+import asyncio
+from collections import defaultdict
+from intcode.vm import IntcodeVM, NEEDS_INPUT, HOT_LOOP
+
+# How many times a loop may jump back to its start before the VM lets the rest of the event loop run
+YIELD_INTERVAL = 1000
+
+
+class AsyncIntcodeVM(IntcodeVM):
+    """
+    An IntcodeVM that runs as a coroutine.  When the program wants input and none is queued, it awaits
+    input_channel.get().  Each message from the channel can be a single value, a sequence of values (like a packet),
+    or a string, which goes in as its character codes.  Outputs are awaited onto output_channel.put(), grouped into
+    message_type messages of message_length values when message_length is more than 1.  Either channel can be an
+    asyncio.Queue or anything else with coroutine get()/put() methods.
+
+    With empty_value set, the program doesn't wait for input: it reads empty_value straight away whenever the
+    channel is empty (the day 23 NICs poll with -1), after giving other tasks a chance to run.
+
+    Counting every instruction would slow down the interpreter, so the VM counts loop iterations instead, including
+    the ones that close with a fused superinstruction.  After yield_interval jumps back to the same loop head it
+    awaits asyncio.sleep(0), and so does every output, so a long computation never starves the other tasks.
+    """
+    def __init__(self, tape, input_channel, output_channel, empty_value=None, message_length=1, message_type=tuple,
+                 yield_interval=YIELD_INTERVAL):
+        super().__init__(tape)
+        self.input_channel = input_channel
+        self.output_channel = output_channel
+        self.empty_value = empty_value
+        self.message_length = message_length
+        self.message_type = message_type
+        self.yield_interval = yield_interval
+        self.loop_counts = defaultdict(self.reset_count)
+
+    def reset_count(self):
+        return -self.yield_interval
+
+    def feed_message(self, message):
+        if isinstance(message, str):
+            self.input.feed(ord(x) for x in message)
+        elif isinstance(message, int):
+            self.input.feed([message])
+        else:
+            self.input.feed(message)
+
+    async def read_channel(self):
+        if self.empty_value is None:
+            self.feed_message(await self.input_channel.get())
+            return
+        # Polling programs spin on their input, so always let everyone else go first
+        await asyncio.sleep(0)
+        if self.input_channel.empty():
+            self.input.feed([self.empty_value])
+        else:
+            self.feed_message(self.input_channel.get_nowait())
+
+    async def run(self):
+        """Runs the program to completion, and returns its memory"""
+        buffer = []
+        while self.curpos is not None:
+            output_value = self.execute(self.input.read, self.loop_counts)
+            if output_value is NEEDS_INPUT:
+                await self.read_channel()
+            elif output_value is HOT_LOOP:
+                self.loop_counts[self.curpos] = self.reset_count()
+                await asyncio.sleep(0)
+            elif output_value is not None:
+                buffer.append(output_value)
+                if len(buffer) == self.message_length:
+                    await self.output_channel.put(output_value if self.message_length == 1
+                                                  else self.message_type(*buffer))
+                    buffer = []
+                await asyncio.sleep(0)
+        return self.memory
@@ -0,0 +1,138 @@
+import numpy as np
+from intcode.opcodes import MODE_POSITION, MODE_IMMEDIATE, MODE_RELATIVE
+from intcode.io import InputExhausted
+from intcode.memory import negative_address
+
+
+class BatchVM(object):
+    """
+    Runs many copies of one program side by side, one per row ("lane") of a 2D int64 memory array, each with its own
+    instruction pointer and relative base.  Every step fetches the instruction word each running lane is sitting on,
+    groups the lanes by word, and runs each group as one vectorized operation, so lanes that take different branches
+    simply end up in different groups until they line up again.
+
+    Lane i reads its inputs from row i of the input matrix, and its outputs go into row i of the output matrix.
+    """
+    def __init__(self, tape, lanes):
+        self.memory = np.tile(np.asarray(tape, dtype=np.int64), (lanes, 1))
+        self.lanes = lanes
+        self.curpos = np.zeros(lanes, dtype=np.int64)
+        self.relative_base = np.zeros(lanes, dtype=np.int64)
+        self.halted = np.zeros(lanes, dtype=bool)
+        self.outputs = np.zeros((lanes, 1), dtype=np.int64)
+        self.output_counts = np.zeros(lanes, dtype=np.int64)
+
+    def grow(self, address):
+        if address < 0:
+            raise negative_address(address)
+        width = self.memory.shape[1]
+        if address >= width:
+            new_width = max(address + 1, 2 * width)
+            self.memory = np.pad(self.memory, ((0, 0), (0, new_width - width)))
+
+    def operand(self, lanes, mode, offset):
+        param = self.memory[lanes, self.curpos[lanes] + offset]
+        if mode == MODE_IMMEDIATE:
+            return param
+        if mode == MODE_RELATIVE:
+            param = param + self.relative_base[lanes]
+        elif mode != MODE_POSITION:
+            raise Exception(f"Unknown mode {mode}")
+        self.grow(int(param.max()))
+        if param.min() < 0:
+            self.grow(int(param.min()))
+        return self.memory[lanes, param]
+
+    def address(self, lanes, mode, offset):
+        address = self.memory[lanes, self.curpos[lanes] + offset]
+        if mode == MODE_RELATIVE:
+            address = address + self.relative_base[lanes]
+        self.grow(int(address.max()))
+        if address.min() < 0:
+            self.grow(int(address.min()))
+        return address
+
+    def write_output(self, lanes, values):
+        counts = self.output_counts[lanes]
+        if counts.max() >= self.outputs.shape[1]:
+            self.outputs = np.pad(self.outputs, ((0, 0), (0, self.outputs.shape[1])))
+        self.outputs[lanes, counts] = values
+        self.output_counts[lanes] = counts + 1
+
+    def step(self, lanes, word, inputs, input_counts):
+        opcode = word % 100
+        first_mode, second_mode, third_mode = word // 100 % 10, word // 1000 % 10, word // 10000 % 10
+        # Make sure the whole instruction is in memory before reading its params
+        self.grow(int(self.curpos[lanes].max()) + 3)
+        if opcode in (1, 2, 7, 8):
+            first = self.operand(lanes, first_mode, 1)
+            second = self.operand(lanes, second_mode, 2)
+            address = self.address(lanes, third_mode, 3)
+            if opcode == 1:
+                value = first + second
+            elif opcode == 2:
+                value = first * second
+            elif opcode == 7:
+                value = (first < second).astype(np.int64)
+            else:
+                value = (first == second).astype(np.int64)
+            self.memory[lanes, address] = value
+            self.curpos[lanes] += 4
+        elif opcode == 3:
+            address = self.address(lanes, first_mode, 1)
+            counts = input_counts[lanes]
+            if counts.max() >= inputs.shape[1]:
+                raise InputExhausted
+            self.memory[lanes, address] = inputs[lanes, counts]
+            input_counts[lanes] = counts + 1
+            self.curpos[lanes] += 2
+        elif opcode == 4:
+            self.write_output(lanes, self.operand(lanes, first_mode, 1))
+            self.curpos[lanes] += 2
+        elif opcode == 5 or opcode == 6:
+            test = self.operand(lanes, first_mode, 1)
+            taken = test != 0 if opcode == 5 else test == 0
+            # Only the lanes that take the jump dereference its target, same as the scalar VM
+            jumping = lanes[taken]
+            self.curpos[lanes[~taken]] += 3
+            if len(jumping):
+                targets = self.operand(jumping, second_mode, 2)
+                if targets.min() < 0:
+                    raise negative_address(int(targets.min()))
+                self.curpos[jumping] = targets
+        elif opcode == 9:
+            self.relative_base[lanes] += self.operand(lanes, first_mode, 1)
+            self.curpos[lanes] += 2
+        elif opcode == 99:
+            self.halted[lanes] = True
+        else:
+            raise Exception(f"Unknown opcode {opcode} at positions {np.unique(self.curpos[lanes])}")
+
+    def run(self, inputs):
+        """
+        Runs every lane until it halts, with lane i reading row i of inputs in order.
+        Returns the output matrix, with row i holding lane i's outputs.  Lanes that output less than the others are
+        padded with zeroes; output_counts says how many values each lane actually wrote.
+        """
+        inputs = np.asarray(inputs, dtype=np.int64).reshape(self.lanes, -1)
+        input_counts = np.zeros(self.lanes, dtype=np.int64)
+        while True:
+            running = np.flatnonzero(~self.halted)
+            if not len(running):
+                break
+            words = self.memory[running, self.curpos[running]]
+            groups, group_of_lane = np.unique(words, return_inverse=True)
+            for group, word in enumerate(groups):
+                self.step(running[group_of_lane == group], int(word), inputs, input_counts)
+        return self.outputs[:, :self.output_counts.max()]
+
+
+def run_batch(tape, inputs):
+    """
+    Runs one copy of tape per row of inputs, all in lockstep, and returns a matrix with each copy's outputs in the
+    matching row.  A 1D inputs gives every copy a single input.
+    """
+    inputs = np.asarray(inputs, dtype=np.int64)
+    if inputs.ndim == 1:
+        inputs = inputs[:, np.newaxis]
+    return BatchVM(tape, len(inputs)).run(inputs)
@@ -0,0 +1,244 @@
+import json
+from typing import NamedTuple, Tuple
+from intcode.opcodes import OPCODES, MODE_POSITION, MODE_IMMEDIATE, MODE_RELATIVE
+
+# Everything the disassembler needs per opcode, looked up rather than worked out per word
+OPCODE_NAMES = {opcode: opcode_class.pretty_name for opcode, opcode_class in OPCODES.items()}
+OPCODE_LENGTHS = {opcode: len(opcode_class.param_types) + 1 for opcode, opcode_class in OPCODES.items()}
+# Mode digits for each possible value of instruction // 100, lowest param first
+MODE_TABLE = [(modes % 10, modes // 10 % 10, modes // 100 % 10) for modes in range(1000)]
+MODE_FORMATS = {MODE_POSITION: "pos({})", MODE_IMMEDIATE: "imm({})", MODE_RELATIVE: "rel({})"}
+JUMP_OPCODES = (5, 6)
+HALT = 99
+
+
+class Instruction(NamedTuple):
+    address: int
+    opcode: int
+    modes: Tuple[int, ...]
+    params: Tuple[int, ...]
+
+    @property
+    def length(self):
+        return len(self.params) + 1
+
+    @property
+    def name(self):
+        return OPCODE_NAMES[self.opcode]
+
+    @property
+    def jump_target(self):
+        """The target of a jump with an immediate target, or None"""
+        if self.opcode in JUMP_OPCODES and self.modes[1] == MODE_IMMEDIATE:
+            return self.params[1]
+        return None
+
+    @property
+    def always_jumps(self):
+        # A jump whose test is an immediate that always passes
+        return (self.opcode in JUMP_OPCODES and self.modes[0] == MODE_IMMEDIATE and
+                (self.params[0] != 0) == (self.opcode == 5))
+
+    @property
+    def never_jumps(self):
+        return (self.opcode in JUMP_OPCODES and self.modes[0] == MODE_IMMEDIATE and
+                (self.params[0] != 0) != (self.opcode == 5))
+
+    def text(self):
+        """Same layout as pretty_print_instruction(inst, print_index=True)"""
+        operands = "".join(" " + MODE_FORMATS.get(mode, "UNKNOWN({})").format(param)
+                           for mode, param in zip(self.modes, self.params))
+        return f"{self.address:05d} {self.name:10}{operands}"
+
+
+def decode_instruction(tape, address):
+    """
+    Decodes the instruction at address, or returns None if there isn't a valid one there.  Words split into opcode
+    and modes the same way the interpreter splits them, so a negative word like -1 is a halt, and mode digits past
+    the last param are ignored.
+    """
+    if not 0 <= address < len(tape):
+        return None
+    word = tape[address]
+    length = OPCODE_LENGTHS.get(word % 100)
+    if length is None or address + length > len(tape):
+        return None
+    modes = MODE_TABLE[word // 100 % len(MODE_TABLE)][:length - 1]
+    if any(mode not in MODE_FORMATS for mode in modes):
+        return None
+    return Instruction(address, word % 100, modes, tuple(tape[address + 1:address + length]))
+
+
+class BasicBlock(object):
+    """
+    A run of instructions that's only ever entered at the top and left at the bottom.  successors holds
+    (address, kind) pairs, kind being "jump" or "fallthrough".  indirect is set when the block ends in a jump whose
+    target is only known at run time (e.g. a return through the relative base), so it may have successors the graph
+    doesn't show.
+    """
+    def __init__(self, start):
+        self.start = start
+        self.instructions = []
+        self.successors = []
+        self.indirect = False
+
+    @property
+    def end(self):
+        """The first address after the block"""
+        last = self.instructions[-1]
+        return last.address + last.length
+
+    @property
+    def last(self):
+        return self.instructions[-1]
+
+    def to_dict(self):
+        return {"start": self.start, "end": self.end, "indirect": self.indirect,
+                "instructions": [instruction.text() for instruction in self.instructions],
+                "successors": [{"address": address, "kind": kind} for address, kind in self.successors]}
+
+
+class ControlFlowGraph(object):
+    """
+    Static disassembly of a program, found by decoding from its entry points and following every jump with an
+    immediate target (and falling through every jump that isn't always taken).  Code only reached through a jump
+    with a computed target is picked up too when it's a return site: the address right after an unconditional jump
+    that some decoded instruction uses as an immediate, which is how Intcode compilers push return addresses.
+
+    blocks maps each block's start address to its BasicBlock.  Everything that isn't part of an instruction ends up in
+    data_regions, as (start, end) address ranges.  to_json() and to_dot() export the graph.
+    """
+    def __init__(self, tape, entries=(0,)):
+        self.tape = tape
+        self.instructions = {}
+        self.blocks = {}
+        self.data_regions = []
+        self.invalid = set()
+        leaders = self.trace_code(list(entries))
+        self.build_blocks(leaders)
+        self.find_data_regions()
+
+    def trace_code(self, to_visit):
+        """Decodes everything reachable from to_visit, and returns the addresses that start basic blocks"""
+        tape = self.tape
+        instructions = self.instructions
+        leaders = set(to_visit)
+        # Addresses right after an unconditional jump or halt, which are either data or a call's return site
+        after_exits = set()
+        constants = set()
+        while True:
+            while to_visit:
+                address = to_visit.pop()
+                while address not in instructions:
+                    instruction = decode_instruction(tape, address)
+                    if instruction is None:
+                        self.invalid.add(address)
+                        break
+                    instructions[address] = instruction
+                    for mode, param in zip(instruction.modes, instruction.params):
+                        if mode == MODE_IMMEDIATE:
+                            constants.add(param)
+                    if instruction.opcode == HALT:
+                        after_exits.add(address + 1)
+                        break
+                    target = instruction.jump_target
+                    if instruction.opcode in JUMP_OPCODES and not instruction.never_jumps:
+                        if target is not None:
+                            leaders.add(target)
+                            to_visit.append(target)
+                        if instruction.always_jumps:
+                            after_exits.add(address + instruction.length)
+                            break
+                        leaders.add(address + instruction.length)
+                    address += instruction.length
+            return_sites = {address for address in after_exits & constants
+                            if address not in instructions and address not in self.invalid and
+                            decode_instruction(tape, address) is not None}
+            if not return_sites:
+                return leaders
+            leaders |= return_sites
+            to_visit = list(return_sites)
+
+    def build_blocks(self, leaders):
+        instructions = self.instructions
+        for start in sorted(leader for leader in leaders if leader in instructions):
+            block = BasicBlock(start)
+            address = start
+            while True:
+                instruction = instructions[address]
+                block.instructions.append(instruction)
+                address += instruction.length
+                if instruction.opcode == HALT:
+                    break
+                if instruction.opcode in JUMP_OPCODES and not instruction.never_jumps:
+                    target = instruction.jump_target
+                    if target is None:
+                        block.indirect = True
+                    elif target in instructions:
+                        block.successors.append((target, "jump"))
+                    if instruction.always_jumps:
+                        break
+                if address in leaders or address not in instructions:
+                    if address in instructions:
+                        block.successors.append((address, "fallthrough"))
+                    break
+            self.blocks[start] = block
+
+    def find_data_regions(self):
+        covered = bytearray(len(self.tape))
+        for address, instruction in self.instructions.items():
+            covered[address:address + instruction.length] = b"\x01" * instruction.length
+        start = None
+        for address, is_code in enumerate(covered):
+            if not is_code and start is None:
+                start = address
+            elif is_code and start is not None:
+                self.data_regions.append((start, address))
+                start = None
+        if start is not None:
+            self.data_regions.append((start, len(covered)))
+
+    def block_containing(self, address):
+        """The block whose instructions cover address, or None"""
+        for block in self.blocks.values():
+            if block.start <= address < block.end:
+                return block
+        return None
+
+    def listing(self):
+        """Readable disassembly: each block's instructions, with data regions in between shown as raw values"""
+        sections = [(block.start, block) for block in self.blocks.values()]
+        sections += [(start, (start, end)) for start, end in self.data_regions]
+        lines = []
+        for _, section in sorted(sections, key=lambda item: item[0]):
+            if isinstance(section, BasicBlock):
+                lines.append(f"block_{section.start}:")
+                lines += ["    " + instruction.text() for instruction in section.instructions]
+            else:
+                start, end = section
+                lines.append(f"{start:05d} data       {self.tape[start:end]}")
+        return "\n".join(lines)
+
+    def to_dict(self):
+        return {"blocks": [self.blocks[start].to_dict() for start in sorted(self.blocks)],
+                "data_regions": [{"start": start, "end": end} for start, end in self.data_regions]}
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.to_dict(), **kwargs)
+
+    def to_dot(self):
+        lines = ["digraph intcode {", '    node [shape=box fontname="monospace"];']
+        for start in sorted(self.blocks):
+            block = self.blocks[start]
+            label = "\\l".join(instruction.text() for instruction in block.instructions) + "\\l"
+            style = ' style=dashed' if block.indirect else ''
+            lines.append(f'    block_{start} [label="{label}"{style}];')
+            for successor, kind in block.successors:
+                edge_style = ' style=dotted' if kind == "fallthrough" else ''
+                lines.append(f'    block_{start} -> block_{successor} [label="{kind}"{edge_style}];')
+        lines.append("}")
+        return "\n".join(lines)
+
+
+def build_cfg(tape, entries=(0,)):
+    return ControlFlowGraph(tape, entries)
@@ -0,0 +1,397 @@
+from intcode.opcodes import process_instruction, MODE_POSITION, MODE_IMMEDIATE, MODE_RELATIVE
+from intcode.decode import InstructionCache, INSTRUCTION_LENGTHS
+from intcode.memory import load_tape, negative_address
+
+BLOCK_FILENAME_PREFIX = "<intcode block"
+
+WRITE_OPCODES = (1, 2, 3, 7, 8)
+JUMP_OPCODES = (5, 6)
+# Instructions that end a basic block.  Outputs end one too, since execution has to go back to the caller
+BLOCK_ENDING_OPCODES = (4, 5, 6, 99)
+# Blocks keep going through unconditional jumps and past conditional ones, so cap how much gets inlined into one
+MAX_BLOCK_INSTRUCTIONS = 32
+
+
+class FallbackToInterpreter(object):
+    # Returned by a compiled block in place of an output value when it's about to write over compiled code
+    pass
+
+
+FALLBACK = FallbackToInterpreter()
+
+
+def operand_source(mode, param):
+    if mode == MODE_POSITION:
+        return f"tape[{param}]"
+    elif mode == MODE_RELATIVE:
+        return f"tape[rb + {param}]"
+    else:
+        return str(param)
+
+
+def relative_guard(mode, param, index, exit_value):
+    """
+    Lines that return (index, rb, exit_value) if a relative operand is about to land below address 0, so the
+    interpreter runs that instruction and raises.  Negative positions never get this far, since they don't decode.
+    """
+    if mode != MODE_RELATIVE:
+        return []
+    return [f"if rb + {param} < 0:", f"    return {index}, rb, {exit_value}"]
+
+
+def instruction_source(record, index, next_index, code_write_value):
+    """
+    Python lines for the decoded instruction at index, for anything but a jump or a halt.  Writes first check
+    code_cells, and return (index, rb, code_write_value) instead of landing on cached code, and so does an operand
+    that would be out of bounds.  Outputs return (next_index, rb, value).
+    """
+    opcode, first_mode, first, second_mode, second, third_mode, third, _ = record
+    lines = relative_guard(first_mode, first, index, code_write_value)
+    if opcode == 9:
+        return lines + [f"rb += {operand_source(first_mode, first)}"]
+    if opcode == 4:
+        return lines + [f"return {next_index}, rb, {operand_source(first_mode, first)}"]
+    if opcode != 3:
+        lines += relative_guard(second_mode, second, index, code_write_value)
+        lines += relative_guard(third_mode, third, index, code_write_value)
+    write_param, write_mode = (first, first_mode) if opcode == 3 else (third, third_mode)
+    if write_mode == MODE_RELATIVE:
+        lines.append(f"address = rb + {write_param}")
+        address = "address"
+    else:
+        address = str(write_param)
+    lines.append(f"if code_cells[{address}] is not None:")
+    lines.append(f"    return {index}, rb, {code_write_value}")
+    if opcode == 3:
+        value = "read_input()"
+    else:
+        first_source = operand_source(first_mode, first)
+        second_source = operand_source(second_mode, second)
+        value = {
+            1: f"{first_source} + {second_source}",
+            2: f"{first_source} * {second_source}",
+            7: f"1 if {first_source} < {second_source} else 0",
+            8: f"1 if {first_source} == {second_source} else 0",
+        }[opcode]
+    lines.append(f"tape[{address}] = {value}")
+    return lines
+
+
+def find_leaders(cache: InstructionCache, entry=0):
+    """
+    Walks everything reachable from entry by falling through or taking a jump with an immediate target, and returns
+    the addresses that start a basic block.  Jumps through memory can't be followed statically; their targets get
+    compiled lazily the first time execution lands on them.
+    """
+    leaders = {entry}
+    to_visit = [entry]
+    visited = set()
+    tape = cache.tape
+    while to_visit:
+        index = to_visit.pop()
+        while index not in visited and 0 <= index < len(tape):
+            visited.add(index)
+            try:
+                opcode, first_mode, first, second_mode, second, _, _, _ = cache.decode(index)
+            except Exception:
+                # Unknown opcode or an instruction running off the end: whatever's here isn't code we can follow
+                break
+            next_index = index + INSTRUCTION_LENGTHS[opcode]
+            if opcode == 99:
+                break
+            if opcode in JUMP_OPCODES:
+                if second_mode == MODE_IMMEDIATE:
+                    leaders.add(second)
+                    to_visit.append(second)
+                # Only an immediate condition can make one of the branches impossible
+                if first_mode == MODE_IMMEDIATE and (opcode == 5) == (first != 0):
+                    break
+            if opcode in BLOCK_ENDING_OPCODES:
+                leaders.add(next_index)
+            index = next_index
+    return leaders
+
+
+def find_failed_instruction(error, line_addresses):
+    """
+    Maps the innermost generated frame in error's traceback back to the instruction it was running, using
+    line_addresses ({code object: {line number: address}}).  Returns (address, relative_base), or None if the error
+    didn't come from generated code.
+    """
+    traceback = error.__traceback__
+    failed = None
+    while traceback is not None:
+        if traceback.tb_frame.f_code in line_addresses:
+            failed = traceback
+        traceback = traceback.tb_next
+    if failed is None:
+        return None
+    address = line_addresses[failed.tb_frame.f_code][failed.tb_lineno]
+    return address, failed.tb_frame.f_locals["rb"]
+
+
+class BlockCache(InstructionCache):
+    """
+    An InstructionCache that makes an instruction volatile when decoding an overlapping one (a jump into the middle
+    of it) evicts it.  Its cells then belong to the other instruction, so writes to them would no longer reach the
+    blocks it was compiled into.
+    """
+    def __init__(self, tape, compiler, records=None, code_cells=None):
+        super().__init__(tape, superinstructions=False, records=records, code_cells=code_cells)
+        self.compiler = compiler
+
+    def evict(self, owner):
+        super().evict(owner)
+        self.compiler.mark_volatile(owner)
+
+
+class BlockCompiler(object):
+    """
+    Translates Intcode into Python one block at a time.  Each block becomes a function with every operand mode
+    already resolved, so running it skips dispatch and mode decoding entirely.  A block starts at a jump target and
+    carries on through jumps that are always taken and past the not-taken side of conditional ones, until it hits an
+    output, a halt, a jump through memory or MAX_BLOCK_INSTRUCTIONS.  A jump back to its own start with an immediate
+    target runs as a while loop inside one call.
+
+    A block is called as block(tape, code_cells, relative_base, read_input) and returns
+    (next_position, relative_base, output_value), where next_position is None after a halt.
+
+    Every write first checks the instruction cache's code_cells.  If it's about to land on compiled code, the block
+    hands back FALLBACK instead and that instruction runs through process_instruction.  The instruction it wrote
+    over is marked volatile: every block containing it is thrown away, and from then on blocks stop in front of it
+    and hand it to process_instruction too, so programs that patch their own operands don't recompile every time.
+    A word that doesn't decode ends its block with a FALLBACK as well, since the program may still write code there
+    before it gets that far.
+
+    compile_tape() keeps one template per program and hands out forks of it.  Forks start with the template's
+    blocks, report volatile instructions back to it, and share any block they compile from unmodified code.
+    """
+    def __init__(self, tape, template=None):
+        self.tape = tape
+        self.template = template
+        if template is None:
+            self.cache = BlockCache(tape, self)
+            self.blocks = [None] * len(tape)
+            self.leaders = set()
+            self.volatile = set()
+            # Instruction start -> leaders of every compiled block that contains it
+            self.block_members = {}
+            # Compiled code object -> {line number: address of the instruction on that line}
+            self.line_addresses = {}
+        else:
+            # Start with every block the template has compiled.  Leaders, volatile instructions and line numbers are
+            # about the program rather than one copy of it, so those are shared with the template
+            self.cache = BlockCache(tape, self, template.cache.records[:], template.cache.code_cells[:])
+            self.blocks = template.blocks[:]
+            self.leaders = template.leaders
+            self.volatile = template.volatile
+            self.block_members = {member: leaders[:] for member, leaders in template.block_members.items()}
+            self.line_addresses = template.line_addresses
+
+    def fork(self, tape):
+        """A compiler for another copy of the same program, starting with every block compiled so far"""
+        return BlockCompiler(tape, self)
+
+    def compile_all(self, entry=0):
+        self.leaders.update(find_leaders(self.cache, entry))
+        for leader in sorted(self.leaders):
+            if leader < len(self.blocks) and self.blocks[leader] is None:
+                try:
+                    self.cache.decode(leader)
+                except IndexError:
+                    pass
+                except Exception:
+                    # Not code, or not code yet; it gets compiled if execution ever does land here
+                    continue
+                self.compile_block(leader)
+
+    def compile_block(self, leader):
+        cache = self.cache
+        try:
+            cache.decode(leader)
+        except IndexError:
+            self.grow(leader + 3)
+        except Exception:
+            pass
+        lines = []
+        addresses = {}
+        members = []
+        loops = False
+        index = leader
+        while True:
+            if index < 0:
+                # Jumped below address 0, which the dispatcher raises for
+                lines.append((index, f"return {index}, rb, None"))
+                break
+            if index in self.volatile:
+                lines.append((index, f"return {index}, rb, FALLBACK"))
+                break
+            try:
+                record = cache.decode(index)
+            except IndexError:
+                # Runs off the end of memory; let the dispatcher come back here once memory has grown
+                lines.append((index, f"return {index}, rb, None"))
+                break
+            except Exception:
+                # Doesn't decode (yet): the program may write code here before it gets this far, so leave it to
+                # interpret(), which reads whatever is there by then and only raises if it's still not an instruction
+                lines.append((index, f"return {index}, rb, FALLBACK"))
+                break
+            opcode, first_mode, first, second_mode, second, third_mode, third, _ = record
+            members.append(index)
+            next_index = index + INSTRUCTION_LENGTHS[opcode]
+            if opcode in WRITE_OPCODES or opcode == 9 or opcode == 4:
+                lines += [(index, line) for line in instruction_source(record, index, next_index, "FALLBACK")]
+                if opcode == 4:
+                    break
+            elif opcode in JUMP_OPCODES:
+                target = operand_source(second_mode, second)
+                target_guard = relative_guard(second_mode, second, index, "FALLBACK")
+                if first_mode != MODE_IMMEDIATE:
+                    comparison = "!=" if opcode == 5 else "=="
+                    lines += [(index, line) for line in relative_guard(first_mode, first, index, "FALLBACK")]
+                    lines.append((index, f"if {operand_source(first_mode, first)} {comparison} 0:"))
+                    if second_mode == MODE_IMMEDIATE and second == leader:
+                        loops = True
+                        lines.append((index, "    continue"))
+                    else:
+                        lines += [(index, "    " + line) for line in target_guard]
+                        lines.append((index, f"    return {target}, rb, None"))
+                elif (first != 0) == (opcode == 5):
+                    # Always taken.  Keep compiling at an immediate target rather than going back to the dispatcher
+                    if second_mode != MODE_IMMEDIATE:
+                        lines += [(index, line) for line in target_guard]
+                        lines.append((index, f"return {target}, rb, None"))
+                        break
+                    next_index = second
+            elif opcode == 99:
+                lines.append((index, "return None, rb, None"))
+                break
+            index = next_index
+            if index == leader:
+                loops = True
+                lines.append((index, "continue"))
+                break
+            if index in members or len(members) >= MAX_BLOCK_INSTRUCTIONS:
+                lines.append((index, f"return {index}, rb, None"))
+                break
+
+        indent = "        " if loops else "    "
+        source = [f"def block_{leader}(tape, code_cells, rb, read_input):"]
+        if loops:
+            source.append("    while True:")
+        for address, line in lines:
+            source.append(indent + line)
+            addresses[len(source)] = address
+        namespace = {"FALLBACK": FALLBACK}
+        code = compile("\n".join(source), f"{BLOCK_FILENAME_PREFIX} {leader}>", "exec")
+        exec(code, namespace)
+        block = namespace[f"block_{leader}"]
+        self.line_addresses[block.__code__] = addresses
+        self.add_block(leader, block, members)
+        if self.template is not None:
+            self.template.share_block(leader, block, members, self.tape)
+        return block
+
+    def add_block(self, leader, block, members):
+        self.blocks[leader] = block
+        for member in members:
+            self.block_members.setdefault(member, []).append(leader)
+
+    def share_block(self, leader, block, members, tape):
+        # Take a block a fork compiled, as long as every instruction in it still matches the original program
+        if leader >= len(self.blocks) or self.blocks[leader] is not None:
+            return
+        for member in members:
+            length = INSTRUCTION_LENGTHS[tape[member] % 100]
+            if member + length > len(self.tape) or tape[member:member+length] != self.tape[member:member+length]:
+                return
+        for member in members:
+            self.cache.decode(member)
+        self.add_block(leader, block, members)
+
+    def grow(self, address):
+        self.cache.grow(address)
+        self.blocks.extend([None] * (len(self.tape) - len(self.blocks)))
+
+    def mark_volatile(self, start):
+        for leader in self.block_members.pop(start, []):
+            self.blocks[leader] = None
+        code_cells = self.cache.code_cells
+        for address in range(start, min(start + 4, len(code_cells))):
+            if code_cells[address] == start:
+                code_cells[address] = None
+        self.cache.records[start] = None
+        self.volatile.add(start)
+
+    def interpret(self, curpos, relative_base, read_input):
+        """
+        Runs the instruction at curpos through the original interpreter.  Used for volatile instructions, for words
+        that didn't decode when their block was compiled, and for writes into compiled code, which turn the
+        instruction they land on volatile.
+        """
+        highest = self.cache.highest_address(curpos, relative_base)
+        if highest >= len(self.tape):
+            self.grow(highest)
+            # Only now that the whole instruction is in memory can its operands be checked
+            self.cache.highest_address(curpos, relative_base)
+        opcode = self.tape[curpos] % 100
+        newpos, instruction = process_instruction(self.tape, curpos, read_input, relative_base)
+        if opcode in WRITE_OPCODES:
+            owner = self.cache.code_cells[instruction.params[-1]]
+            if owner is not None:
+                self.mark_volatile(owner)
+                if self.template is not None:
+                    self.template.mark_volatile(owner)
+        if instruction.relative_adjustment_amount is not None:
+            relative_base += instruction.relative_adjustment_amount
+        return newpos, relative_base, instruction.output_value
+
+    def execute(self, curpos, relative_base, read_input):
+        """Same contract as vm.execute: returns (curpos, relative_base, output_value) on an output or a halt"""
+        tape = self.tape
+        blocks = self.blocks
+        code_cells = self.cache.code_cells
+        while True:
+            try:
+                while True:
+                    if curpos < 0:
+                        raise negative_address(curpos)
+                    block = blocks[curpos]
+                    if block is None:
+                        block = self.compile_block(curpos)
+                    curpos, relative_base, output_value = block(tape, code_cells, relative_base, read_input)
+                    if output_value is FALLBACK:
+                        curpos, relative_base, output_value = self.interpret(curpos, relative_base, read_input)
+                    if output_value is not None or curpos is None:
+                        return curpos, relative_base, output_value
+            except IndexError as error:
+                failed = find_failed_instruction(error, self.line_addresses)
+                if failed is None:
+                    # The dispatcher itself jumped past the end of memory
+                    highest = curpos + 3
+                else:
+                    curpos, relative_base = failed
+                    highest = self.cache.highest_address(curpos, relative_base)
+                if highest < len(tape):
+                    raise
+                self.grow(highest)
+
+
+# Program image -> compiled template, so VMs running the same program share their compiled blocks
+compiled_programs = {}
+
+
+def compile_tape(tape, entry=0):
+    """
+    Returns a BlockCompiler for a fresh copy of tape.  The first call for a given program compiles everything
+    reachable from entry; later calls fork that template, so running the same program many times only pays for
+    compilation once.
+    """
+    key = (tuple(tape), entry)
+    template = compiled_programs.get(key)
+    if template is None:
+        template = BlockCompiler(load_tape(tape))
+        template.compile_all(entry)
+        compiled_programs[key] = template
+    return template.fork(load_tape(tape))
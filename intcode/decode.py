@@ -0,0 +1,137 @@
+from intcode.opcodes import OPCODES, MODE_POSITION, MODE_IMMEDIATE, MODE_RELATIVE
+from intcode.memory import grow_memory, negative_address
+from intcode.peephole import fuse, SUPERINSTRUCTION_LENGTHS, SUPERINSTRUCTION_LENGTH, ALWAYS
+
+# Number of words each opcode takes up, including the opcode itself
+INSTRUCTION_LENGTHS = {opcode: len(opcode_class.param_types) + 1 for opcode, opcode_class in OPCODES.items()}
+INSTRUCTION_LENGTHS.update(SUPERINSTRUCTION_LENGTHS)
+
+
+class InstructionCache(object):
+    """
+    Holds each address's instruction decoded into (opcode, mode, param, mode, param, mode, param, jump_target), so a
+    loop only pays for splitting out the mode digits the first time it runs.  Unused param slots are immediate zeroes.
+
+    With superinstructions on, arithmetic followed by a jump on its result is decoded as one fused record covering
+    both instructions (see intcode.peephole), and jump_target holds the jump's immediate target.  Otherwise it's 0.
+
+    records and code_cells are lists kept the same length as the tape, so both are indexed by address.
+    code_cells holds, for every address covered by a cached instruction, that instruction's start.  The VM checks its
+    writes against it and calls invalidate() when a program modifies its own code, so the next visit decodes the
+    new contents.  Each cell belongs to at most one cached instruction; decoding one that overlaps an existing
+    record (a jump into the middle of an instruction) evicts the old record.
+
+    A cache can start from tables decoded earlier (e.g. a snapshot's), which it then owns and updates in place.
+    """
+    def __init__(self, tape, superinstructions=True, records=None, code_cells=None):
+        self.tape = tape
+        self.superinstructions = superinstructions
+        self.records = [None] * len(tape) if records is None else records
+        self.code_cells = [None] * len(tape) if code_cells is None else code_cells
+
+    def decode(self, index):
+        tape = self.tape
+        instruction = tape[index]
+        opcode = instruction % 100
+        length = INSTRUCTION_LENGTHS.get(opcode)
+        if length is None:
+            raise Exception(f"Unknown opcode {opcode} at position {index} on {tape}")
+        modes = instruction // 100
+        # Reading the params may run off the end of memory; the VM grows it and decodes again
+        if length == 4:
+            record = (opcode, modes % 10, tape[index+1], modes // 10 % 10, tape[index+2], modes // 100 % 10,
+                      tape[index+3], 0)
+            if self.superinstructions and modes // 100 % 10 != MODE_IMMEDIATE:
+                fused = fuse(tape, index, record)
+                if fused is not None:
+                    record = fused
+                    length = SUPERINSTRUCTION_LENGTH
+        elif length == 3:
+            record = (opcode, modes % 10, tape[index+1], modes // 10 % 10, tape[index+2], MODE_IMMEDIATE, 0, 0)
+        elif length == 2:
+            record = (opcode, modes % 10, tape[index+1], MODE_IMMEDIATE, 0, MODE_IMMEDIATE, 0, 0)
+        else:
+            record = (opcode, MODE_IMMEDIATE, 0, MODE_IMMEDIATE, 0, MODE_IMMEDIATE, 0, 0)
+        # A list would read a negative position from its other end, so those are caught here, where it costs nothing
+        # per run.  Relative addresses depend on the relative base, so the VM checks them as it goes.  The VM treats
+        # any mode it doesn't know as immediate, so those have to be caught here too
+        for mode, param in zip(record[1:7:2], record[2:7:2]):
+            if mode == MODE_POSITION and param < 0:
+                raise negative_address(param)
+            if mode > MODE_RELATIVE:
+                raise Exception(f"Unknown mode {mode}")
+        self.records[index] = record
+        code_cells = self.code_cells
+        for address in range(index, index+length):
+            owner = code_cells[address]
+            if owner is not None and owner != index:
+                self.evict(owner)
+            code_cells[address] = index
+        return record
+
+    def evict(self, owner):
+        # The instruction at owner overlaps one that's just been decoded, so it goes
+        self.records[owner] = None
+
+    def predecode(self, entry=0):
+        """
+        Decodes everything reachable from entry by falling through or taking a jump with an immediate target, so a
+        VM snapshot can hand its forks the program already decoded.  Stops at anything that won't decode.
+        """
+        to_visit = [entry]
+        visited = set()
+        while to_visit:
+            index = to_visit.pop()
+            while index not in visited and 0 <= index < len(self.tape):
+                visited.add(index)
+                try:
+                    record = self.records[index] or self.decode(index)
+                except Exception:
+                    break
+                opcode = record[0]
+                if opcode == 99:
+                    break
+                if opcode > 99:
+                    to_visit.append(record[7])
+                    if opcode % 10 == ALWAYS:
+                        break
+                elif opcode == 5 or opcode == 6:
+                    if record[3] == MODE_IMMEDIATE:
+                        to_visit.append(record[4])
+                    if record[1] == MODE_IMMEDIATE and (record[2] != 0) == (opcode == 5):
+                        break
+                index += INSTRUCTION_LENGTHS[opcode]
+
+    def invalidate(self, address):
+        owner = self.code_cells[address]
+        self.code_cells[address] = None
+        if owner is not None:
+            self.records[owner] = None
+
+    def grow(self, address):
+        # Grow the tape to cover address, and keep the per-address tables in step with it
+        grow_memory(self.tape, address)
+        extra = len(self.tape) - len(self.records)
+        self.records.extend([None] * extra)
+        self.code_cells.extend([None] * extra)
+
+    def highest_address(self, index, relative_base):
+        """
+        The highest address the instruction at index can touch, including the instruction itself.
+        Used to work out how far to grow memory after an access runs off the end of it.  Raises if the instruction
+        would touch a negative address instead, since memory can't grow to cover that.
+        """
+        if index + 3 >= len(self.tape):
+            return index + 3
+        record = self.records[index]
+        if record is None:
+            record = self.decode(index)
+        highest = index + INSTRUCTION_LENGTHS[record[0]] - 1
+        for mode, param in zip(record[1::2], record[2::2]):
+            if mode == MODE_POSITION:
+                highest = max(highest, param)
+            elif mode == MODE_RELATIVE:
+                if relative_base + param < 0:
+                    raise negative_address(relative_base + param)
+                highest = max(highest, relative_base + param)
+        return highest
@@ -0,0 +1,181 @@
+from intcode.opcodes import MODE_IMMEDIATE, MODE_RELATIVE
+
+LESS_THAN = 7
+EQUALS = 8
+
+
+def exit_iteration(first_difference, step, comparison, keep_going):
+    """
+    Which pass of a counting loop is its last.  On pass i (counting from 1) the loop compares
+    first_difference + (i - 1) * step against zero, with < for LESS_THAN or == for EQUALS, and goes around again as
+    long as the comparison comes out as keep_going.  Returns the first pass where it doesn't, or None if it never
+    stops.
+    """
+    if comparison == LESS_THAN:
+        if (first_difference < 0) != keep_going:
+            return 1
+        if keep_going:
+            # Counting up out of the negatives
+            return None if step <= 0 else 1 + (-first_difference + step - 1) // step
+        return None if step >= 0 else 2 + first_difference // -step
+    if (first_difference == 0) != keep_going:
+        return 1
+    if step == 0:
+        return None
+    if keep_going:
+        return 2
+    if -first_difference % step or -first_difference // step <= 0:
+        # Steps right over zero
+        return None
+    return 1 - first_difference // step
+
+
+class CountingLoop(object):
+    """
+    A loop that only adds loop-invariant amounts to its own variables, and runs until a comparison of those
+    variables (with each other or with invariants) comes out the other way, or until one of them hits zero.
+    Intcode compilers produce these for multiplication, division and modulo by repeated addition.  Calling it runs
+    every remaining pass at once: it works out how many passes are left, adds that many steps to each variable, sets
+    the comparison's flag the way the last pass leaves it, and carries on after the loop.
+
+    updates holds (variable, amount, lag) for each add; operands are (mode, param) pairs, relative to the relative
+    base at run time.  test describes the exit condition as (comparison, first, second, keep_going, flag), where
+    first and second are ("var", variable) or ("const", operand), and flag is the cell the comparison writes (None
+    when the jump tests a variable directly, which is an EQUALS against 0).  lag is 1 for variables the comparison
+    reads before their add in the same pass.
+
+    Anything the recognizer can't tell ahead of time (cells that alias under this relative base, writes to code,
+    memory that hasn't grown far enough, a loop that never stops) is checked per call, and falls back to fallback,
+    the regular trace.
+    """
+    def __init__(self, updates, test, exit_address):
+        self.updates = updates
+        self.test = test
+        self.exit_address = exit_address
+        self.fallback = None
+
+    def __call__(self, tape, code_cells, rb, read_input):
+        addresses = {}
+        for variable, _, _ in self.updates:
+            addresses[variable] = self.address(variable, rb)
+        comparison, first, second, keep_going, flag = self.test
+        written = list(addresses.values())
+        if flag is not None:
+            written.append(self.address(flag, rb))
+        read = [self.address(operand, rb) for _, operand, _ in self.updates]
+        read += [self.address(operand, rb) for kind, operand in (first, second) if kind == "const"]
+        read = [address for address in read if address is not None]
+        if (len(set(written)) != len(written) or set(written) & set(read) or
+                min(written + read) < 0 or max(written + read) >= len(tape) or
+                any(code_cells[address] is not None for address in written)):
+            return self.fallback(tape, code_cells, rb, read_input)
+        steps = {}
+        for variable, amount, _ in self.updates:
+            steps[variable] = self.value(tape, amount, rb)
+        lags = {variable: lag for variable, _, lag in self.updates}
+
+        def term(operand):
+            # (value on the first pass, change per pass)
+            kind, operand = operand
+            if kind == "const":
+                return self.value(tape, operand, rb), 0
+            return tape[addresses[operand]] + (1 - lags[operand]) * steps[operand], steps[operand]
+        first_value, first_step = term(first)
+        second_value, second_step = term(second)
+        passes = exit_iteration(first_value - second_value, first_step - second_step, comparison, keep_going)
+        if passes is None:
+            return self.fallback(tape, code_cells, rb, read_input)
+        for variable, address in addresses.items():
+            tape[address] += passes * steps[variable]
+        if flag is not None:
+            tape[written[-1]] = 0 if keep_going else 1
+        return self.exit_address, rb, None
+
+    @staticmethod
+    def address(operand, rb):
+        mode, param = operand
+        if mode == MODE_IMMEDIATE:
+            return None
+        return rb + param if mode == MODE_RELATIVE else param
+
+    @staticmethod
+    def value(tape, operand, rb):
+        mode, param = operand
+        if mode == MODE_IMMEDIATE:
+            return param
+        return tape[rb + param] if mode == MODE_RELATIVE else tape[param]
+
+
+def recognize_counting_loop(steps):
+    """
+    Looks for a CountingLoop in one recorded pass around a loop (a list of intcode.jit.TraceStep), and returns it,
+    or None if the loop is anything else.  The pass has to be adds, at most one less_than or equals, and a
+    conditional jump on the result (or straight on one of the added-to variables) back to the top.
+    """
+    *body, jump = steps
+    jump_opcode, test_mode, test_param, target_mode, _, _, _, _ = jump.record
+    if jump_opcode not in (5, 6) or not jump.taken or test_mode == MODE_IMMEDIATE or target_mode != MODE_IMMEDIATE:
+        return None
+    updates = {}
+    comparisons = []
+    for position, step in enumerate(body):
+        opcode, first_mode, first, second_mode, second, third_mode, third, _ = step.record
+        first, second, target = (first_mode, first), (second_mode, second), (third_mode, third)
+        if third_mode == MODE_IMMEDIATE:
+            # The interpreter writes those to the param's address, but reading the same operand gives the param
+            return None
+        if target in updates or any(target == flag for _, _, _, flag in comparisons):
+            return None
+        if opcode == 1:
+            if first == target:
+                updates[target] = (second, position)
+            elif second == target:
+                updates[target] = (first, position)
+            else:
+                return None
+        elif opcode == LESS_THAN or opcode == EQUALS:
+            comparisons.append((opcode, (first, second), position, target))
+        else:
+            return None
+    if len(comparisons) > 1:
+        return None
+    written = set(updates)
+    for amount, _ in updates.values():
+        if amount in written:
+            return None
+    test = (test_mode, test_param)
+
+    def lag(variable, position):
+        return 1 if updates[variable][1] > position else 0
+
+    def classify(operand, position):
+        if operand in updates:
+            return ("var", operand), lag(operand, position)
+        if comparisons and operand == comparisons[0][3]:
+            return None, None
+        return ("const", operand), 0
+
+    if comparisons:
+        opcode, operands, position, flag = comparisons[0]
+        if test != flag:
+            return None
+        (first, first_lag), (second, second_lag) = [classify(operand, position) for operand in operands]
+        if first is None or second is None:
+            return None
+        keep_going = jump_opcode == 5
+    else:
+        if test not in updates:
+            return None
+        opcode, flag = EQUALS, None
+        first, first_lag = ("var", test), 0
+        second, second_lag = ("const", (MODE_IMMEDIATE, 0)), 0
+        keep_going = jump_opcode == 6
+    # The flag can't be anything an add reads either
+    if flag is not None and any(amount == flag for amount, _ in updates.values()):
+        return None
+    lags = {variable: 0 for variable in updates}
+    for operand, operand_lag in ((first, first_lag), (second, second_lag)):
+        if operand[0] == "var":
+            lags[operand[1]] = operand_lag
+    update_list = [(variable, amount, lags[variable]) for variable, (amount, _) in updates.items()]
+    return CountingLoop(update_list, (opcode, first, second, keep_going, flag), jump.index + 3)
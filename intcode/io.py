@@ -0,0 +1,114 @@
+from array import array
+from collections import deque
+import sys
+
+
+class InputExhausted(Exception):
+    pass
+
+
+class QueueInput(object):
+    """
+    Default input policy: values are read in order from an internal deque.
+    When the deque runs dry, either return empty_value (the day 25 terminal reads -1 while waiting) or raise
+    InputExhausted if there is no sensible placeholder.
+
+    If source is given, it's a Queue-like object that gets drained into the deque whenever the program reads input,
+    which is how a driver hands data to a VM running in another process.
+    """
+    def __init__(self, values=(), empty_value=None, source=None):
+        self.queue = deque()
+        self.empty_value = empty_value
+        self.source = source
+        self.feed(values)
+
+    def feed(self, values):
+        self.queue.extend(values)
+
+    def read(self):
+        if self.source is not None and not self.source.empty():
+            self.feed(self.source.get())
+        try:
+            return self.queue.popleft()
+        except IndexError:
+            pass
+        if self.empty_value is None:
+            raise InputExhausted
+        return self.empty_value
+
+
+class AsciiInput(QueueInput):
+    """Same as QueueInput, but strings get fed in as their character codes"""
+    def feed(self, values):
+        if isinstance(values, str):
+            values = [ord(x) for x in values]
+        self.queue.extend(values)
+
+
+def decode_ascii(values):
+    """
+    Packs a run of ASCII outputs (a list or array('q') of them) into a bytearray, e.g. a whole day 17 camera frame.
+    Raises ValueError if any of them is outside of 0-255.
+    """
+    if isinstance(values, array):
+        values = values.tolist()
+    return bytearray(values)
+
+
+class PrintOutput(object):
+    def write(self, value):
+        print(f"OUTPUT VALUE: {value}")
+
+
+class AsciiTerminal(AsciiInput):
+    """
+    Input and output for the ASCII programs (days 17, 21 and 25) in one object: pass it as both the input and the
+    output policy.  Commands are fed in as whole strings, and get a newline on the end if they don't have one.
+
+    Output is collected in a bytearray and written to stream a line at a time, and whatever is left is flushed before
+    every input read, so prompts show up before the program waits on them.  Values outside of ASCII (like day 21's
+    hull damage) aren't printed; they go onto the results list instead.  With echo off, ASCII output is dropped.
+    """
+    def __init__(self, stream=None, echo=True, empty_value=None):
+        super().__init__(empty_value=empty_value)
+        self.stream = stream if stream is not None else sys.stdout
+        self.echo = echo
+        self.buffer = bytearray()
+        self.results = []
+
+    def feed(self, values):
+        if isinstance(values, str) and not values.endswith("\n"):
+            values += "\n"
+        super().feed(values)
+
+    def read(self):
+        self.flush()
+        return super().read()
+
+    def write(self, value):
+        if not 0 <= value < 128:
+            self.results.append(value)
+        elif self.echo:
+            self.buffer.append(value)
+            if value == 10:
+                self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.stream.write(self.buffer.decode("ascii"))
+            self.buffer.clear()
+
+
+class QueueOutput(object):
+    """Collects num_outputs values at a time and puts them onto a Queue-like object as a single message"""
+    def __init__(self, queue, num_outputs=1, message_type=tuple):
+        self.queue = queue
+        self.num_outputs = num_outputs
+        self.message_type = message_type
+        self.buffer = []
+
+    def write(self, value):
+        self.buffer.append(value)
+        if len(self.buffer) == self.num_outputs:
+            self.queue.put(self.message_type(*self.buffer))
+            self.buffer = []
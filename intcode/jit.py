@@ -0,0 +1,217 @@
+from collections import defaultdict
+from typing import NamedTuple
+from intcode.opcodes import process_instruction, MODE_IMMEDIATE
+from intcode.decode import InstructionCache
+from intcode.memory import load_tape
+from intcode.vm import execute, HOT_LOOP
+from intcode.compiler import operand_source, relative_guard, instruction_source, find_failed_instruction, \
+    WRITE_OPCODES, JUMP_OPCODES
+from intcode.idioms import recognize_counting_loop
+
+TRACE_FILENAME_PREFIX = "<intcode trace"
+
+# How many times a jump has to go back to an address before the loop there gets traced
+HOT_LOOP_THRESHOLD = 50
+# Recordings that run longer than this without getting back to the loop head are abandoned
+MAX_TRACE_LENGTH = 500
+# Loop counter value for heads that couldn't be traced, so they never come due again
+NEVER = float("-inf")
+
+
+class TraceStep(NamedTuple):
+    index: int
+    record: tuple
+    next_index: int
+    # Whether a conditional jump went to its target when this was recorded
+    taken: bool
+
+
+class TraceCache(InstructionCache):
+    """An InstructionCache that also throws away every trace running through an instruction that gets written to"""
+    def __init__(self, tape, jit):
+        # Traces are recorded instruction by instruction, so they need the program decoded as written
+        super().__init__(tape, superinstructions=False)
+        self.jit = jit
+
+    def invalidate(self, address):
+        owner = self.code_cells[address]
+        super().invalidate(address)
+        if owner is not None:
+            self.jit.drop_traces(owner)
+
+
+def trace_lines(steps):
+    """Python source for one pass over the recorded steps, as (address, line) pairs"""
+    lines = []
+    for index, record, next_index, taken in steps:
+        opcode, first_mode, first, second_mode, second, _, _, _ = record
+        if opcode in WRITE_OPCODES or opcode == 9 or opcode == 4:
+            # Guard on writes: the trace was recorded from the code as it was, so writes to code go to the interpreter
+            lines += [(index, line) for line in instruction_source(record, index, next_index, "None")]
+        elif opcode in JUMP_OPCODES:
+            target = operand_source(second_mode, second)
+            # Guard: the condition has to come out the way it did while recording
+            if first_mode != MODE_IMMEDIATE:
+                comparison = "==" if (opcode == 5) == taken else "!="
+                exit_to = index + 3 if taken else target
+                lines += [(index, line) for line in relative_guard(first_mode, first, index, "None")]
+                lines.append((index, f"if {operand_source(first_mode, first)} {comparison} 0:"))
+                if not taken:
+                    lines += [(index, "    " + line) for line in relative_guard(second_mode, second, index, "None")]
+                lines.append((index, f"    return {exit_to}, rb, None"))
+            # Guard: a jump through memory has to land where it did while recording
+            if taken and second_mode != MODE_IMMEDIATE:
+                lines += [(index, line) for line in relative_guard(second_mode, second, index, "None")]
+                lines.append((index, f"if {target} != {next_index}:"))
+                lines.append((index, f"    return {target}, rb, None"))
+    return lines
+
+
+class TracingJIT(object):
+    """
+    Runs a program through vm.execute, counting how often jumps go backwards to each address.  Once a loop head
+    passes the threshold, the next pass around the loop runs through process_instruction while every instruction,
+    branch direction and jump target gets recorded.  The recording is compiled into a Python function that repeats
+    it in a while loop, with a guard on every branch and every write.  The first guard that fails returns to the
+    interpreter at the point where execution leaves the recorded path.
+
+    Traces may contain inputs and outputs.  An output returns from the trace, so the instruction after each one gets
+    its own entry point that finishes the pass and then carries on looping.
+
+    A loop that can't be recorded (it halts, modifies its own code or runs past MAX_TRACE_LENGTH first) is left to
+    the interpreter for good.  A write to an instruction inside a trace throws the trace away.
+
+    Counting loops (see intcode.idioms) skip the trace, and have all their remaining passes worked out at once.
+    """
+    def __init__(self, tape, threshold=HOT_LOOP_THRESHOLD):
+        self.tape = tape
+        self.threshold = threshold
+        self.cache = TraceCache(tape, self)
+        self.loop_counts = defaultdict(self.reset_count)
+        # Entry address -> compiled trace
+        self.traces = {}
+        # Instruction start -> entry addresses of every trace that contains it
+        self.trace_members = {}
+        # Compiled code object -> {line number: address of the instruction on that line}
+        self.line_addresses = {}
+        # (loop head, steps so far) while a loop is being recorded
+        self.recording = None
+
+    def reset_count(self):
+        return -self.threshold
+
+    def drop_traces(self, owner):
+        for entry in self.trace_members.pop(owner, []):
+            if self.traces.pop(entry, None) is not None and self.loop_counts[entry] >= 0:
+                # Let the loop warm up again and get traced from its new code
+                self.loop_counts[entry] = self.reset_count()
+
+    def record(self, curpos, relative_base, read_input):
+        """
+        Steps through the loop being recorded until it gets back to the head, an output needs returning or the
+        recording has to be abandoned.  Returns (curpos, relative_base, output_value) like vm.execute.
+        """
+        head, steps = self.recording
+        tape = self.tape
+        cache = self.cache
+        while True:
+            highest = cache.highest_address(curpos, relative_base)
+            if highest >= len(tape):
+                cache.grow(highest)
+                # Only now that the whole instruction is in memory can its operands be checked
+                cache.highest_address(curpos, relative_base)
+            record = cache.records[curpos] or cache.decode(curpos)
+            newpos, instruction = process_instruction(tape, curpos, read_input, relative_base)
+            opcode = record[0]
+            taken = opcode in JUMP_OPCODES and (instruction.params[0] != 0) == (opcode == 5)
+            steps.append(TraceStep(curpos, record, newpos, taken))
+            if instruction.relative_adjustment_amount is not None:
+                relative_base += instruction.relative_adjustment_amount
+            if opcode in WRITE_OPCODES and cache.code_cells[instruction.params[-1]] is not None:
+                cache.invalidate(instruction.params[-1])
+                self.abandon_recording()
+            elif newpos is None or len(steps) >= MAX_TRACE_LENGTH:
+                self.abandon_recording()
+            elif newpos == head:
+                self.recording = None
+                self.compile_trace(head, steps)
+            if self.recording is None or instruction.output_value is not None:
+                return newpos, relative_base, instruction.output_value
+            curpos = newpos
+
+    def abandon_recording(self):
+        head, _ = self.recording
+        self.loop_counts[head] = NEVER
+        self.recording = None
+
+    def compile_trace(self, head, steps):
+        lines = trace_lines(steps)
+        self.add_trace(head, head, [], lines, steps)
+        counting_loop = recognize_counting_loop(steps)
+        if counting_loop is not None:
+            # Run the rest of the loop in one go, falling back to the trace whenever that can't be done
+            counting_loop.fallback = self.traces[head]
+            self.traces[head] = counting_loop
+        for position, step in enumerate(steps[:-1]):
+            if step.record[0] == 4 and step.next_index not in self.traces:
+                self.add_trace(step.next_index, head, trace_lines(steps[position+1:]), lines, steps)
+
+    def add_trace(self, entry, head, prefix, lines, steps):
+        source = [f"def trace_{entry}(tape, code_cells, rb, read_input):"]
+        addresses = {}
+        for address, line in prefix:
+            source.append("    " + line)
+            addresses[len(source)] = address
+        source.append("    while True:")
+        for address, line in lines:
+            source.append("        " + line)
+            addresses[len(source)] = address
+        namespace = {}
+        code = compile("\n".join(source), f"{TRACE_FILENAME_PREFIX} {head}>", "exec")
+        exec(code, namespace)
+        trace = namespace[f"trace_{entry}"]
+        self.line_addresses[trace.__code__] = addresses
+        self.traces[entry] = trace
+        for step in steps:
+            self.trace_members.setdefault(step.index, []).append(entry)
+
+    def execute(self, curpos, relative_base, read_input):
+        """Same contract as vm.execute: returns (curpos, relative_base, output_value) on an output or a halt"""
+        tape = self.tape
+        cache = self.cache
+        # Traces are only entered from loop heads and output continuations, never straight after a guard fails
+        enter_trace = True
+        while True:
+            if self.recording is not None:
+                curpos, relative_base, output_value = self.record(curpos, relative_base, read_input)
+                enter_trace = True
+            elif enter_trace and curpos in self.traces:
+                try:
+                    curpos, relative_base, output_value = self.traces[curpos](tape, cache.code_cells,
+                                                                             relative_base, read_input)
+                except IndexError as error:
+                    failed = find_failed_instruction(error, self.line_addresses)
+                    if failed is None:
+                        raise
+                    curpos, relative_base = failed
+                    highest = cache.highest_address(curpos, relative_base)
+                    if highest < len(tape):
+                        raise
+                    cache.grow(highest)
+                    output_value = None
+                enter_trace = False
+            else:
+                curpos, relative_base, output_value = execute(tape, curpos, relative_base, read_input, cache,
+                                                              self.loop_counts)
+                if output_value is HOT_LOOP:
+                    if curpos not in self.traces:
+                        self.recording = (curpos, [])
+                    enter_trace = True
+                    continue
+            if output_value is not None or curpos is None:
+                return curpos, relative_base, output_value
+
+
+def trace_tape(tape, threshold=HOT_LOOP_THRESHOLD):
+    """Returns a TracingJIT for a fresh copy of tape"""
+    return TracingJIT(load_tape(tape), threshold)
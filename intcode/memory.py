@@ -0,0 +1,49 @@
+from itertools import chain
+
+# Snapshots split memory into pages of this many words, so that snapshots of related VMs can share them
+PAGE_SIZE = 256
+
+
+def load_tape(tape):
+    """
+    Intcode memory is a plain list: one contiguous block of ints, with no hashing per access.
+    Anything past the end reads as zero; the VM grows the list with grow_memory() when a program touches it.
+    Accepts a program listing, the memory handed back by a previous run, or a {address: value} dict.
+    """
+    if isinstance(tape, dict):
+        memory = [0] * (max(tape, default=-1) + 1)
+        for address, value in tape.items():
+            memory[address] = value
+        return memory
+    return list(tape)
+
+
+def negative_address(address):
+    # Memory only grows upwards, so every backend raises this for an address below 0
+    return Exception(f"Negative address {address} is out of bounds")
+
+
+def grow_memory(tape, address):
+    # Grow geometrically so a program walking off the end doesn't trigger a resize per word
+    if address < 0:
+        raise negative_address(address)
+    new_size = max(address + 1, 2 * len(tape))
+    tape.extend([0] * (new_size - len(tape)))
+
+
+def memory_pages(tape, base_pages=()):
+    """
+    Splits memory into a tuple of PAGE_SIZE-word tuples for a snapshot.  Pages whose contents match the same page of
+    base_pages (normally the snapshot the VM was forked from) reuse that page instead of storing another copy.
+    """
+    pages = []
+    for page_number, start in enumerate(range(0, len(tape), PAGE_SIZE)):
+        page = tuple(tape[start:start+PAGE_SIZE])
+        if page_number < len(base_pages) and base_pages[page_number] == page:
+            page = base_pages[page_number]
+        pages.append(page)
+    return tuple(pages)
+
+
+def load_pages(pages):
+    return list(chain.from_iterable(pages))
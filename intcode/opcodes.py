@@ -14,12 +14,12 @@ class OpCodeBase(object):
     pretty_name = ""
     param_types = []
 
-    def __init__(self, tape, index, input_value_iter, relative_base):
+    def __init__(self, tape, index, read_input, relative_base):
         self.tape = tape
         self.index = index
         self.newindex = self.index + self.length
         self.instruction = [tape[x] for x in range(self.index, self.index+self.length)]
-        self.input = input_value_iter
+        self.input = read_input
         self.relative_base = relative_base
         self.output_value = None
         self.relative_adjustment_amount = None
@@ -87,7 +87,7 @@ class OpcodeInput(OpCodeBase):
 
     def run(self):
         position_to_store = self.params[0]
-        self.tape[position_to_store] = next(self.input)
+        self.tape[position_to_store] = self.input()
 
 
 class OpcodeOutput(OpCodeBase):
@@ -200,13 +200,18 @@ def pretty_print_instruction(inst: OpCodeBase, print_index=False, print_relbase=
     return outstr
 
 
+def disassembly_tape(tape):
+    # Building an instruction dereferences its operands, so disassemble against memory that can't run out
+    return defaultdict(int, enumerate(tape))
+
+
 def pretty_print_tape(tape, starting_pos=0):
-    tmptape = defaultdict(int, {x[0]: x[1] for x in enumerate(tape)})
+    tmptape = disassembly_tape(tape)
     curpos = starting_pos
     while curpos < len(tape):
         opcode = tape[curpos] % 100
         try:
-            instruction = OPCODES[opcode](tmptape, curpos, iter([]), relative_base=0)
+            instruction = OPCODES[opcode](tmptape, curpos, None, relative_base=0)
         except KeyError:
             # Once we hit an unknown opcode, we can't continue because we don't know how many bytes to advance
             print("Hit bad opcode, terminating naive pretty print")
@@ -215,48 +220,14 @@ def pretty_print_tape(tape, starting_pos=0):
         curpos += instruction.length
 
 
-def process_instruction(tape, index, input_value, relative_base) -> Tuple[int, OpCodeBase]:
+def process_instruction(tape, index, read_input, relative_base) -> Tuple[int, OpCodeBase]:
     opcode = tape[index] % 100
 
     if opcode in OPCODES:
-        instruction = OPCODES[opcode](tape, index, input_value, relative_base)
+        instruction = OPCODES[opcode](tape, index, read_input, relative_base)
         instruction.run()
         # Good for debug, not necessary most of the time
         # print(pretty_print_instruction(instruction, print_index=True, print_relbase=True))
         return instruction.newindex, instruction
     else:
         raise Exception(f"Unknown opcode {opcode} at position {index} on {tape}")
-
-
-def run_tape_generator(tape, num_outputs=1):
-    tmptape = defaultdict(int, {x[0]: x[1] for x in enumerate(tape)})
-    curpos = 0
-    relative_base = 0
-    input_base = yield
-    input_iter = iter(input_base)
-    output_values = []
-    while curpos is not None:
-        curpos, completed_instruction = process_instruction(tmptape, curpos, input_iter, relative_base)
-        if completed_instruction.relative_adjustment_amount is not None:
-            relative_base += completed_instruction.relative_adjustment_amount
-        if completed_instruction.output_value is not None:
-            output_values.append(completed_instruction.output_value)
-            if len(output_values) == num_outputs:
-                input_base = yield tuple(output_values)
-                input_iter = iter(input_base)
-                output_values = []
-
-
-def run_tape(tape, input_values, starting_pos=0, relative_base=0):
-    tmptape = defaultdict(int, {x[0]: x[1] for x in enumerate(tape)})
-    curpos = starting_pos
-    tape_output = None
-    input_value_iter = iter(input_values)
-    while curpos is not None:
-        curpos, completed_instruction = process_instruction(tmptape, curpos, input_value_iter, relative_base)
-        if completed_instruction.relative_adjustment_amount is not None:
-            relative_base += completed_instruction.relative_adjustment_amount
-        # Originally I had just "if output" here, but that failed when output was legitimately 0
-        if completed_instruction.output_value is not None:
-            tape_output = completed_instruction.output_value
-    return tmptape, curpos, tape_output, relative_base
\ No newline at end of file
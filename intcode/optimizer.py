@@ -0,0 +1,368 @@
+import math
+from collections import defaultdict
+from intcode.opcodes import MODE_POSITION, MODE_IMMEDIATE
+from intcode.cfg import build_cfg, decode_instruction, OPCODE_LENGTHS
+from intcode.memory import load_tape
+from intcode.decode import InstructionCache
+from intcode.io import InputExhausted
+from intcode.vm import IntcodeVM, execute, HOT_LOOP, NEEDS_INPUT
+
+# How many times the start of a program may go around any one loop at load time before folding gives up there
+PREFIX_LOOP_BUDGET = 100000
+OUTPUT_LENGTH = 2
+UNBOUNDED = (-math.inf, math.inf)
+# Joins into a block after this many changes widen whichever bound is still moving to infinity, so loops that keep
+# adjusting the relative base still converge
+WIDEN_AFTER = 3
+MAX_PASSES = 20
+ARITHMETIC = {
+    1: lambda first, second: first + second,
+    2: lambda first, second: first * second,
+    7: lambda first, second: 1 if first < second else 0,
+    8: lambda first, second: 1 if first == second else 0,
+}
+# Which operand slots each opcode reads, and which one it writes
+READ_OPERANDS = {1: (0, 1), 2: (0, 1), 3: (), 4: (0,), 5: (0, 1), 6: (0, 1), 7: (0, 1), 8: (0, 1), 9: (0,), 99: ()}
+WRITE_OPERANDS = {1: 2, 2: 2, 3: 0, 7: 2, 8: 2}
+
+
+def no_input():
+    raise InputExhausted
+
+
+def fold_prefix(tape, loop_budget=PREFIX_LOOP_BUDGET):
+    """
+    Until a program first does any I/O, everything it computes only depends on its own image, so all of it can be
+    done at load time: its initialization code, unpacking data, and so on.  Runs tape up to just before its first
+    input or output (or its halt) and returns (memory, curpos, relative_base) from there, which behave exactly like
+    the original program from the start.  Programs that never do I/O are cut off after loop_budget iterations of any
+    one loop.
+    """
+    memory = load_tape(tape)
+    cache = InstructionCache(memory)
+    loop_counts = defaultdict(lambda: -loop_budget)
+    curpos, relative_base, output_value = execute(memory, 0, 0, no_input, cache, loop_counts, pause_on_input=True)
+    if output_value is None or output_value is NEEDS_INPUT or output_value is HOT_LOOP:
+        return memory, curpos, relative_base
+    # Outputs don't write anything, so starting over from the output instruction repeats it exactly
+    return memory, curpos - OUTPUT_LENGTH, relative_base
+
+
+class OptimizedProgram(object):
+    """
+    Result of optimize_tape().  Start image at entry with relative_base, through vm() or any runner given those as
+    its starting position and relative base.
+
+    folded maps the address of each instruction ConstantAnalysis rewrote to its length, dead_stores maps the address
+    of each provably dead store to why it's dead, and constants maps each cell proven to keep its value to that
+    value.  If the analysis couldn't prove anything, those are empty and reason says why.
+    """
+    def __init__(self, image, entry, relative_base, folded=(), dead_stores=None, constants=None, reason=None):
+        self.image = image
+        self.entry = entry
+        self.relative_base = relative_base
+        self.folded = dict(folded)
+        self.dead_stores = dead_stores or {}
+        self.constants = constants or {}
+        self.reason = reason
+
+    def vm(self):
+        return IntcodeVM(self.image, self.entry, self.relative_base)
+
+
+class ConstantAnalysis(object):
+    """
+    Abstract interpretation of a program over its control-flow graph (intcode.cfg).  Tracks the range the relative
+    base can be in at every instruction, which gives every read and write a range of addresses, and from those finds
+    the cells that provably always hold their current value: cells that nothing writes, or that only ever get written
+    the value they already had.  Operand reads of those cells can then be folded into immediates.
+
+    Intcode has no indirect addressing, so programs index arrays by writing into the operands of their own
+    instructions.  An operand whose cell can be written is treated as unknown, and a write to an instruction's
+    opcode makes the program impossible to analyze.
+
+    The analysis starts out assuming every cell is constant and no operand changes, and drops assumptions until the
+    writes it finds agree with them; since no write can break an assumption before some earlier write has, that
+    fixed point is safe.  Jumps with computed targets (returns, function pointers) are assumed to land on some address
+    the program holds as a value somewhere, with the relative base unknown.  verify_optimization() checks the result
+    against the original by running both.
+    """
+    def __init__(self, tape, entry=0, relative_base=0):
+        self.tape = tape
+        self.entry = entry
+        self.relative_base = relative_base
+        self.cfg = build_cfg(tape, (entry,))
+        self.jump_targets = set()
+        if any(block.indirect for block in self.cfg.blocks.values()):
+            self.jump_targets = {value for value in set(tape) if decode_instruction(tape, value) is not None}
+            self.cfg = build_cfg(tape, (entry,) + tuple(sorted(self.jump_targets)))
+        # Cells that have to keep their values for the control-flow graph to hold: opcodes, the tests of jumps it
+        # treats as always or never taken, and words that don't decode (running one crashes the original too)
+        self.fixed_cells = set(self.cfg.instructions) | self.cfg.invalid
+        for address, instruction in self.cfg.instructions.items():
+            if instruction.always_jumps or instruction.never_jumps:
+                self.fixed_cells.add(address + 1)
+        self.code_cells = set()
+        for address, instruction in self.cfg.instructions.items():
+            self.code_cells.update(range(address, address + instruction.length))
+        self.constants = dict(enumerate(tape))
+        self.dynamic = set()
+        self.bases = {}
+        self.reads = []
+        self.writes = []
+
+    def address_range(self, instruction, slot, base):
+        if instruction.address + 1 + slot in self.dynamic:
+            return UNBOUNDED
+        mode, param = instruction.modes[slot], instruction.params[slot]
+        if mode == MODE_POSITION:
+            return param, param
+        return base[0] + param, base[1] + param
+
+    def exact_address(self, instruction, slot, base):
+        low, high = self.address_range(instruction, slot, base)
+        return low if low == high else None
+
+    def operand_value(self, instruction, slot, base):
+        """The value an operand always reads, or None if it isn't known"""
+        if instruction.modes[slot] == MODE_IMMEDIATE:
+            return None if instruction.address + 1 + slot in self.dynamic else instruction.params[slot]
+        address = self.exact_address(instruction, slot, base)
+        return None if address is None else self.constants.get(address)
+
+    def adjust_base(self, instruction, base):
+        amount = self.operand_value(instruction, 0, base)
+        if amount is None:
+            return UNBOUNDED
+        return base[0] + amount, base[1] + amount
+
+    def instructions_with_bases(self):
+        """Every reachable instruction, with the range the relative base is in when it runs"""
+        for start, base in self.bases.items():
+            for instruction in self.cfg.blocks[start].instructions:
+                yield instruction, base
+                if instruction.opcode == 9:
+                    base = self.adjust_base(instruction, base)
+
+    def analyze_bases(self):
+        blocks = self.cfg.blocks
+        self.bases = {self.entry: (self.relative_base, self.relative_base)}
+        changes = defaultdict(int)
+        to_visit = [self.entry]
+        while to_visit:
+            start = to_visit.pop()
+            block = blocks[start]
+            base = self.bases[start]
+            for instruction in block.instructions:
+                if instruction.opcode == 9:
+                    base = self.adjust_base(instruction, base)
+            successors = [(address, base) for address, _ in block.successors]
+            if block.indirect or block.last.address + 2 in self.dynamic:
+                successors += [(address, UNBOUNDED) for address in self.jump_targets]
+            for successor, base in successors:
+                if successor not in blocks:
+                    continue
+                old = self.bases.get(successor)
+                new = base if old is None else (min(old[0], base[0]), max(old[1], base[1]))
+                if new == old:
+                    continue
+                changes[successor] += 1
+                if old is not None and changes[successor] > WIDEN_AFTER:
+                    new = (old[0] if new[0] == old[0] else -math.inf, old[1] if new[1] == old[1] else math.inf)
+                self.bases[successor] = new
+                to_visit.append(successor)
+
+    def collect_accesses(self):
+        """Every read as an address range, and every write as (address range, value written or None)"""
+        self.reads = []
+        self.writes = []
+        for instruction, base in self.instructions_with_bases():
+            opcode = instruction.opcode
+            for slot in READ_OPERANDS[opcode]:
+                if instruction.modes[slot] != MODE_IMMEDIATE:
+                    self.reads.append(self.address_range(instruction, slot, base))
+            slot = WRITE_OPERANDS.get(opcode)
+            if slot is None:
+                continue
+            value = None
+            if opcode in ARITHMETIC:
+                first = self.operand_value(instruction, 0, base)
+                second = self.operand_value(instruction, 1, base)
+                if first is not None and second is not None:
+                    value = ARITHMETIC[opcode](first, second)
+            self.writes.append((self.address_range(instruction, slot, base), value))
+
+    def written_cells(self, cells):
+        """The cells out of cells that some write could change"""
+        cells = sorted(cells)
+        changed = set()
+        for (low, high), value in self.writes:
+            if low == high:
+                if low in self.constants and self.constants[low] != value:
+                    changed.add(low)
+                continue
+            # A write that could land on a whole range of cells can only be harmless if it's writing their value
+            changed.update(cell for cell in cells if low <= cell <= high and self.constants.get(cell) != value)
+        return changed
+
+    def run(self):
+        """Analyzes the program, and returns None if it worked or the reason it couldn't"""
+        if self.entry not in self.cfg.blocks:
+            return "the program doesn't start with a valid instruction"
+        # The interpreter runs words with unknown mode digits, or that run past the end of the image, where the
+        # graph stops instead, so anything they do would be missing from the analysis
+        runnable = sorted(address for address in self.cfg.invalid
+                          if 0 <= address < len(self.tape) and self.tape[address] % 100 in OPCODE_LENGTHS)
+        if runnable:
+            return f"the program may run instructions it can't decode at {runnable[:10]}"
+        for _ in range(MAX_PASSES):
+            self.analyze_bases()
+            self.collect_accesses()
+            changed = self.written_cells(set(self.constants) | self.code_cells)
+            modified = changed & self.fixed_cells
+            if modified:
+                self.constants = {}
+                return f"the program may rewrite its own instructions at {sorted(modified)[:10]}"
+            dynamic = self.dynamic | (changed & self.code_cells)
+            constants = {cell: value for cell, value in self.constants.items() if cell not in changed}
+            if dynamic == self.dynamic and constants == self.constants:
+                return None
+            self.dynamic = dynamic
+            self.constants = constants
+        self.constants = {}
+        return "the analysis didn't settle"
+
+    def is_read(self, start, end):
+        return any(low <= end and start <= high for low, high in self.reads)
+
+    def fold(self, image):
+        """
+        Rewrites operands that always read a constant as immediates in image, and returns {address: length} for the
+        instructions it changed
+        """
+        folded = {}
+        # How many decoded instructions cover each cell.  Rewriting a cell two instructions share (a jump into the
+        # middle of an instruction) would change the other one too
+        coverage = defaultdict(int)
+        for address, instruction in self.cfg.instructions.items():
+            for cell in range(address, address + instruction.length):
+                coverage[cell] += 1
+        for instruction, base in self.instructions_with_bases():
+            address = instruction.address
+            end = address + instruction.length - 1
+            cells = range(address, end + 1)
+            # Code the program reads or writes as data has to stay exactly as it was
+            if self.is_read(address, end) or any(cell in self.dynamic for cell in cells):
+                continue
+            # So does code that shares cells with other code, or with words that don't decode
+            if any(coverage[cell] > 1 or cell in self.cfg.invalid for cell in cells):
+                continue
+            opcode = instruction.opcode
+            modes = list(instruction.modes)
+            params = list(instruction.params)
+            for slot in READ_OPERANDS[opcode]:
+                value = self.operand_value(instruction, slot, base)
+                if value is not None:
+                    modes[slot], params[slot] = MODE_IMMEDIATE, value
+            if opcode in ARITHMETIC and modes[0] == modes[1] == MODE_IMMEDIATE:
+                # Fully constant, so store the result directly
+                params[0], params[1] = ARITHMETIC[opcode](params[0], params[1]), 0
+                opcode = 1
+            word = opcode + sum(mode * 10 ** (slot + 2) for slot, mode in enumerate(modes))
+            rewritten = [word] + params
+            if rewritten != image[address:end + 1]:
+                image[address:end + 1] = rewritten
+                folded[address] = instruction.length
+        return folded
+
+    def find_dead_stores(self):
+        dead_stores = {}
+        for instruction, base in self.instructions_with_bases():
+            slot = WRITE_OPERANDS.get(instruction.opcode)
+            if slot is None or instruction.opcode not in ARITHMETIC:
+                continue
+            target = self.exact_address(instruction, slot, base)
+            if target is None or target < 0:
+                continue
+            if target in self.constants:
+                dead_stores[instruction.address] = f"only ever stores {self.constants[target]}, which [{target}] " \
+                                                   f"already holds"
+            elif target not in self.code_cells and not self.is_read(target, target):
+                dead_stores[instruction.address] = f"nothing ever reads [{target}]"
+        return dead_stores
+
+
+# Program image -> OptimizedProgram, so running the same program many times only pays for optimizing it once
+optimized_programs = {}
+
+
+def optimize_tape(tape):
+    """
+    Folds everything the program does before its first I/O into its image (fold_prefix), then runs ConstantAnalysis
+    over the rest, and returns an OptimizedProgram.  Dead stores are only reported, not removed: the stores still
+    decide what's left in memory, which drivers like day 2's read their answers from.  Results are shared between
+    calls, so treat the image as read-only.
+    """
+    key = tuple(tape)
+    program = optimized_programs.get(key)
+    if program is None:
+        program = optimized_programs[key] = optimize_image(tape)
+    return program
+
+
+def optimize_image(tape):
+    image, entry, relative_base = fold_prefix(tape)
+    if entry is None:
+        return OptimizedProgram(image, entry, relative_base, reason="the program halts before doing any I/O")
+    analysis = ConstantAnalysis(image[:], entry, relative_base)
+    reason = analysis.run()
+    if reason is not None:
+        return OptimizedProgram(image, entry, relative_base, reason=reason)
+    folded = analysis.fold(image)
+    return OptimizedProgram(image, entry, relative_base, folded, analysis.find_dead_stores(), analysis.constants)
+
+
+def verify_optimization(tape, optimized, input_values=()):
+    """
+    Runs the original program and the optimized one side by side on input_values, and raises if they output
+    different things, stop in different states, or end up with different memory anywhere but the folded code.
+    Returns the outputs.
+    """
+    # Both runs need the same values, so don't let the first one use up an iterator
+    input_values = list(input_values)
+    original_vm = IntcodeVM(tape)
+    optimized_vm = optimized.vm()
+    original_outputs = original_vm.run(input_values)
+    optimized_outputs = optimized_vm.run(input_values)
+    if original_outputs != optimized_outputs or original_vm.status is not optimized_vm.status:
+        raise Exception(f"Optimized program diverged: output {optimized_outputs} ({optimized_vm.status}) instead of "
+                        f"{original_outputs} ({original_vm.status})")
+    folded_cells = set()
+    for address, length in optimized.folded.items():
+        folded_cells.update(range(address, address + length))
+    original_memory, optimized_memory = original_vm.memory, optimized_vm.memory
+    for address in range(max(len(original_memory), len(optimized_memory))):
+        if address in folded_cells:
+            continue
+        original_value = original_memory[address] if address < len(original_memory) else 0
+        optimized_value = optimized_memory[address] if address < len(optimized_memory) else 0
+        if original_value != optimized_value:
+            raise Exception(f"Optimized program diverged: memory[{address}] is {optimized_value} instead of "
+                            f"{original_value}")
+    return original_outputs
+
+
+# Programs the optimizer has got wrong before, with input to run them on.  python -m intcode.optimizer checks them all
+REGRESSIONS = [
+    # The instructions at 6 and 8 overlap, so folding either one changed the other
+    ([3, 37, 8, 36, 33, 29, 1007, 32, 7, 37, 1, 40, 40, 38, 1006, 32, 8, 99, 0, 0, 0, 0, 0, 0, 0, 0, 0, 6, -3, -1, 0, 3,
+      -4, -4, 9, -5, 1, -1, 5, -5, 5, 3], [0]),
+    # The jump lands on the -1 inside the instruction at 4, which the interpreter runs as a halt
+    ([3, 30, 4, 29, 107, -1, 23, 28, 1105, 5, 5, 99] + [0] * 20, [0]),
+]
+
+
+if __name__ == '__main__':
+    for PROGRAM, INPUT_VALUES in REGRESSIONS:
+        verify_optimization(PROGRAM, optimize_image(PROGRAM), INPUT_VALUES)
+    print(f"All {len(REGRESSIONS)} programs still optimize correctly")
@@ -0,0 +1,44 @@
+from intcode.opcodes import MODE_IMMEDIATE
+
+# Superinstructions are numbered 100 + 10 * the arithmetic opcode + the jump opcode, so 175 is a less_than whose
+# result feeds straight into a jump_true.  A jump opcode of 0 stands for a jump that's always taken.
+SUPERINSTRUCTION_BASE = 100
+ALWAYS = 0
+FUSABLE_ARITHMETIC = (1, 2, 7, 8)
+SUPERINSTRUCTION_LENGTH = 7
+SUPERINSTRUCTION_LENGTHS = {SUPERINSTRUCTION_BASE + 10 * arithmetic + jump: SUPERINSTRUCTION_LENGTH
+                            for arithmetic in FUSABLE_ARITHMETIC for jump in (ALWAYS, 5, 6)}
+
+
+def fuse(tape, index, record):
+    """
+    Peephole pass for the decoder.  record is the decoded arithmetic instruction at index; if the instruction right
+    after it is a jump that either tests the cell it just wrote or is always taken, returns the pair as one
+    superinstruction record: the arithmetic record with the jump target appended, under a fused opcode.
+    Otherwise returns None.
+
+    The usual shapes out of an Intcode compiler are a less_than/equal into a temporary followed by a branch on that
+    temporary, and a loop counter increment followed by the jump back to the top of the loop.  Only jumps with an
+    immediate target are fused, so nothing the superinstruction reads can be out of bounds once its write is done.
+    """
+    opcode, _, _, _, _, write_mode, write_param, _ = record
+    jump_index = index + 4
+    if jump_index + 2 >= len(tape):
+        return None
+    jump_instruction = tape[jump_index]
+    jump_opcode = jump_instruction % 100
+    if jump_opcode != 5 and jump_opcode != 6:
+        return None
+    test_mode = jump_instruction // 100 % 10
+    target_mode = jump_instruction // 1000 % 10
+    test, target = tape[jump_index+1], tape[jump_index+2]
+    if target_mode != MODE_IMMEDIATE:
+        return None
+    if test_mode == MODE_IMMEDIATE:
+        if (test != 0) != (jump_opcode == 5):
+            # Never taken, so there's nothing to save by fusing it
+            return None
+        jump_opcode = ALWAYS
+    elif test_mode != write_mode or test != write_param:
+        return None
+    return (SUPERINSTRUCTION_BASE + 10 * opcode + jump_opcode,) + record[1:7] + (target,)
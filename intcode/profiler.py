@@ -0,0 +1,143 @@
+from array import array
+from pathlib import Path
+import sys
+from intcode.opcodes import OPCODES, pretty_print_instruction, disassembly_tape
+from intcode.decode import InstructionCache
+from intcode.vm import IntcodeVM, dispatch_loop
+
+# Opcodes are two digits, so a flat table indexed by opcode covers all of them
+OPCODE_SLOTS = 100
+REPORT_LIMIT = 20
+
+
+def zeroed_counters(size):
+    return array("q", bytes(8 * size))
+
+
+class Profile(object):
+    """
+    Execution counters for one program, kept in preallocated int64 arrays so counting costs an index and an add:
+      opcode_counts[opcode]   how many times each opcode ran
+      address_hits[address]   how many times the instruction at each address ran
+      loop_counts[address]    how many times a jump went backwards to each address, i.e. loop iterations by loop head
+    The per-address arrays grow along with the program's memory.
+    """
+    def __init__(self, size):
+        self.opcode_counts = zeroed_counters(OPCODE_SLOTS)
+        self.address_hits = zeroed_counters(size)
+        self.loop_counts = zeroed_counters(size)
+
+    def grow(self, size):
+        extra = size - len(self.address_hits)
+        if extra > 0:
+            self.address_hits.extend(zeroed_counters(extra))
+            self.loop_counts.extend(zeroed_counters(extra))
+
+    @property
+    def total(self):
+        return sum(self.opcode_counts)
+
+    def report(self, tape, limit=REPORT_LIMIT):
+        """
+        Sorted hot-spot report: instructions run per opcode, then the limit most-run addresses and busiest loop
+        heads, each annotated with the instruction at that address in tape (normally the VM's memory at the end).
+        """
+        total = self.total or 1
+        memory = disassembly_tape(tape)
+
+        def describe(address):
+            opcode = memory[address] % 100
+            if opcode not in OPCODES:
+                return f"{address:05d} <not an instruction any more>"
+            return pretty_print_instruction(OPCODES[opcode](memory, address, None, relative_base=0),
+                                            print_index=True)
+
+        lines = [f"{self.total} instructions executed", "", "By opcode:"]
+        by_opcode = sorted((count, opcode) for opcode, count in enumerate(self.opcode_counts) if count)
+        for count, opcode in reversed(by_opcode):
+            lines.append(f"  {OPCODES[opcode].pretty_name:10} {count:12} {100 * count / total:6.2f}%")
+
+        lines += ["", "Hottest addresses:"]
+        hottest = sorted(range(len(self.address_hits)), key=self.address_hits.__getitem__, reverse=True)[:limit]
+        for address in hottest:
+            hits = self.address_hits[address]
+            if not hits:
+                break
+            lines.append(f"  {hits:12} {100 * hits / total:6.2f}%  {describe(address)}")
+
+        lines += ["", "Busiest loop heads (backward jumps taken):"]
+        loops = sorted(range(len(self.loop_counts)), key=self.loop_counts.__getitem__, reverse=True)[:limit]
+        for address in loops:
+            iterations = self.loop_counts[address]
+            if not iterations:
+                break
+            lines.append(f"  {iterations:12}  {describe(address)}")
+        return "\n".join(lines)
+
+
+execute_profiled = dispatch_loop("execute_profiled", """
+    intcode.vm.execute() with every instruction it runs counted into profile as it goes.  A cache passed in must not
+    use superinstructions, so each instruction is counted at its own address.
+    """, params="profile", setup="""
+if cache is None:
+    cache = InstructionCache(tape, superinstructions=False)
+opcode_counts = profile.opcode_counts
+address_hits = profile.address_hits
+jump_counts = profile.loop_counts
+# Whether the instruction at curpos has been counted yet, in case it has to be taken back
+counted = False
+""", instruction="""
+opcode_counts[opcode] += 1
+address_hits[curpos] += 1
+counted = True
+""", backward_jump="""
+jump_counts[{operand}] += 1
+""", paused="""
+# The read will be retried, so it doesn't count yet
+opcode_counts[opcode] -= 1
+address_hits[curpos] -= 1
+""", done="""
+counted = False
+""", grow="""
+# The instruction gets run again, so take back the count for this attempt
+if counted:
+    opcode_counts[opcode] -= 1
+    address_hits[curpos] -= 1
+    counted = False
+profile.grow(len(tape))
+""")
+
+
+class ProfiledVM(IntcodeVM):
+    """
+    An IntcodeVM that counts everything it runs into a Profile (in its profile attribute) as it goes.
+    """
+    def __init__(self, tape, curpos=0, relative_base=0):
+        super().__init__(tape, curpos, relative_base)
+        self.cache = InstructionCache(self.memory, superinstructions=False)
+        self.profile = Profile(len(self.memory))
+
+    def execute(self, read_input, loop_counts=None):
+        if self.curpos is None:
+            return None
+        self.curpos, self.relative_base, output_value = execute_profiled(self.memory, self.curpos,
+                                                                         self.relative_base, read_input, self.cache,
+                                                                         loop_counts, pause_on_input=True,
+                                                                         profile=self.profile)
+        return self.finish_execute(output_value)
+
+    def report(self, limit=REPORT_LIMIT):
+        return self.profile.report(self.memory, limit)
+
+
+def profile_tape(tape, input_values=()):
+    """Runs tape until it halts or runs out of input, and returns the ProfiledVM it ran on"""
+    vm = ProfiledVM(tape)
+    vm.run(input_values)
+    return vm
+
+
+if __name__ == '__main__':
+    # python -m intcode.profiler inputs/advent2019_day09_input.txt 2
+    PROGRAM = [int(x) for x in Path(sys.argv[1]).read_text().split(",")]
+    print(profile_tape(PROGRAM, [int(x) for x in sys.argv[2:]]).report())
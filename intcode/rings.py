@@ -0,0 +1,212 @@
+from collections import deque
+from multiprocessing import Process
+from multiprocessing.shared_memory import SharedMemory
+from array import array
+import time
+from intcode.sharedmem import SharedProgram, load_shared_program, WORD_FORMAT
+
+RING_CAPACITY = 1024
+RING_BATCH_SIZE = 256
+# The consumer's and producer's counters each get their own cache line, so the two sides don't fight over it
+HEAD = 0
+TAIL = 8
+HEADER_WORDS = 16
+SLOT_WORDS = 3
+WORD_SIZE = 8
+# How long a NIC that has gone idle sleeps between polls, so a quiet network doesn't eat every core
+NODE_IDLE_SLEEP = 0.0005
+
+
+class PacketRing(object):
+    """
+    A fixed-size single-producer/single-consumer queue of int64 triples in shared memory.  Created without a name it
+    makes (and owns) a new block; with one, it attaches to a ring some other process made.
+
+    Neither side takes a lock.  The producer only ever writes the slots and the tail counter, and the consumer only
+    ever writes the head counter, and each side publishes its counter after touching the slots.  That relies on
+    aligned 8-byte stores being atomic and staying in order, which holds on x86-64.
+    """
+    def __init__(self, capacity=RING_CAPACITY, name=None):
+        self.capacity = capacity
+        self.owner = name is None
+        size = (HEADER_WORDS + capacity * SLOT_WORDS) * WORD_SIZE
+        self.block = SharedMemory(name=name, create=self.owner, size=size if self.owner else 0)
+        self.words = self.block.buf.cast(WORD_FORMAT)
+        if self.owner:
+            self.words[HEAD] = 0
+            self.words[TAIL] = 0
+
+    @property
+    def name(self):
+        return self.block.name
+
+    def __len__(self):
+        return self.words[TAIL] - self.words[HEAD]
+
+    def push(self, first, second, third):
+        """Adds a triple to the ring, or returns False if it's full"""
+        words = self.words
+        tail = words[TAIL]
+        if tail - words[HEAD] >= self.capacity:
+            return False
+        slot = HEADER_WORDS + tail % self.capacity * SLOT_WORDS
+        words[slot:slot + SLOT_WORDS] = array(WORD_FORMAT, (first, second, third))
+        words[TAIL] = tail + 1
+        return True
+
+    def pop_batch(self, limit=RING_BATCH_SIZE):
+        """Takes up to limit triples off the ring at once, oldest first"""
+        words = self.words
+        head = words[HEAD]
+        count = min(words[TAIL] - head, limit)
+        if count <= 0:
+            return []
+        start = head % self.capacity
+        end = min(start + count, self.capacity)
+        values = words[HEADER_WORDS + start * SLOT_WORDS:HEADER_WORDS + end * SLOT_WORDS].tolist()
+        # The batch wraps around the end of the ring
+        if end - start < count:
+            values += words[HEADER_WORDS:HEADER_WORDS + (count - (end - start)) * SLOT_WORDS].tolist()
+        words[HEAD] = head + count
+        iterator = iter(values)
+        return list(zip(iterator, iterator, iterator))
+
+    def close(self):
+        self.words.release()
+        self.block.close()
+        if self.owner:
+            self.block.unlink()
+
+
+def run_ring_node(program_name, program_length, address, outbox_name, inbox_name, capacity, status_name,
+                  idle_value, idle_threshold):
+    """
+    Runs one NIC of a RingRouter network until it's terminated.  It starts with its address as its first input,
+    reads (sender, x, y) triples from its inbox, and pushes every three outputs onto its outbox as (dest, x, y).
+    Its entry in the status block counts how many times in a row it has polled an empty inbox.
+    """
+    vm = load_shared_program(program_name, program_length)
+    outbox = PacketRing(capacity, outbox_name)
+    inbox = PacketRing(capacity, inbox_name)
+    status_block = SharedMemory(name=status_name)
+    status = status_block.buf.cast(WORD_FORMAT)
+    pending = deque([address])
+    empty_polls = 0
+
+    def read_input():
+        nonlocal empty_polls
+        if not pending and len(inbox):
+            # Clear the idle count before the packets leave the ring, so the router never sees this NIC idle with
+            # an empty inbox while it still has work
+            empty_polls = status[address] = 0
+            for _, x, y in inbox.pop_batch():
+                pending.extend((x, y))
+        if pending:
+            empty_polls = status[address] = 0
+            return pending.popleft()
+        empty_polls += 1
+        status[address] = empty_polls
+        if empty_polls >= idle_threshold:
+            time.sleep(NODE_IDLE_SLEEP)
+        return idle_value
+
+    buffer = []
+    while not vm.halted:
+        output_value = vm.execute(read_input)
+        if output_value is None:
+            continue
+        empty_polls = status[address] = 0
+        buffer.append(output_value)
+        if len(buffer) == SLOT_WORDS:
+            while not outbox.push(*buffer):
+                time.sleep(NODE_IDLE_SLEEP)
+            buffer = []
+
+
+class RingRouter(object):
+    """
+    Runs a day 23 style network with one process per NIC, passing packets through PacketRings instead of pickling
+    them through multiprocessing Queues.  Each NIC gets an outbox ring it sends (dest, x, y) on, and an inbox ring
+    the router delivers (sender, x, y) on.  The program image is published once through a SharedProgram.
+
+    Each run_round() drains every outbox in batches of up to batch_size packets.  Packets for addresses inside the
+    network go straight on to that NIC's inbox; anything else comes back as (sender, message_type(dest, x, y)) for the
+    caller to deal with, same as RoundRobinScheduler.run_round().  send() injects a packet from outside.
+
+    The network is idle once every ring is empty and every NIC has polled its empty inbox idle_threshold times in a
+    row.  Use the router as a context manager, or call close(), to stop the NICs and free the shared memory.
+    """
+    def __init__(self, tape, num_nodes, capacity=RING_CAPACITY, batch_size=RING_BATCH_SIZE, idle_value=-1,
+                 idle_threshold=2, message_type=tuple):
+        self.num_nodes = num_nodes
+        self.batch_size = batch_size
+        self.idle_threshold = idle_threshold
+        self.message_type = message_type
+        self.program = SharedProgram(tape)
+        self.outboxes = [PacketRing(capacity) for _ in range(num_nodes)]
+        self.inboxes = [PacketRing(capacity) for _ in range(num_nodes)]
+        # Packets that didn't fit in a full inbox wait here until it has room
+        self.backlogs = [deque() for _ in range(num_nodes)]
+        self.status_block = SharedMemory(create=True, size=num_nodes * WORD_SIZE)
+        self.status = self.status_block.buf.cast(WORD_FORMAT)
+        for address in range(num_nodes):
+            self.status[address] = 0
+        self.nodes = [Process(target=run_ring_node, daemon=True,
+                              args=(self.program.name, self.program.length, address, self.outboxes[address].name,
+                                    self.inboxes[address].name, capacity, self.status_block.name, idle_value,
+                                    idle_threshold))
+                      for address in range(num_nodes)]
+        for node in self.nodes:
+            node.start()
+
+    def deliver(self, dest, sender, x, y):
+        backlog = self.backlogs[dest]
+        if backlog or not self.inboxes[dest].push(sender, x, y):
+            backlog.append((sender, x, y))
+
+    def send(self, address, values):
+        x, y = values
+        self.deliver(address, -1, x, y)
+
+    def run_round(self):
+        """Routes one batch from every outbox, and returns the packets addressed outside the network"""
+        for address, backlog in enumerate(self.backlogs):
+            inbox = self.inboxes[address]
+            while backlog and inbox.push(*backlog[0]):
+                backlog.popleft()
+        messages = []
+        for sender, outbox in enumerate(self.outboxes):
+            for dest, x, y in outbox.pop_batch(self.batch_size):
+                if 0 <= dest < self.num_nodes:
+                    self.deliver(dest, sender, x, y)
+                else:
+                    messages.append((sender, self.message_type(dest, x, y)))
+        return messages
+
+    @property
+    def idle(self):
+        # The inboxes have to be checked before the idle counts and the outboxes after them: a NIC clears its count
+        # before taking packets off its inbox, and only gets back to idle after pushing everything it sent
+        if any(self.backlogs) or any(len(inbox) for inbox in self.inboxes):
+            return False
+        if any(self.status[address] < self.idle_threshold for address in range(self.num_nodes)):
+            return False
+        return not any(len(outbox) for outbox in self.outboxes)
+
+    def close(self):
+        for node in self.nodes:
+            node.terminate()
+        for node in self.nodes:
+            node.join()
+        for ring in self.outboxes + self.inboxes:
+            ring.close()
+        self.status.release()
+        self.status_block.close()
+        self.status_block.unlink()
+        self.program.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
@@ -0,0 +1,96 @@
+from intcode.io import QueueInput
+from intcode.decode import InstructionCache
+from intcode.memory import load_tape
+from intcode.vm import execute
+from intcode.compiler import compile_tape
+from intcode.jit import trace_tape
+from intcode.optimizer import optimize_tape, verify_optimization
+
+
+def load_program(tape, compiled=False, traced=False, entry=0):
+    """
+    Returns (memory, step), where step(curpos, relative_base, read_input) runs until the next output or halt.
+    compiled=True runs the program as Python translated by intcode.compiler instead of through the interpreter.
+    traced=True interprets it, but hands hot loops to intcode.jit.  entry is where compilation starts from.
+    """
+    if compiled:
+        machine = compile_tape(tape, entry)
+        return machine.tape, machine.execute
+    if traced:
+        machine = trace_tape(tape)
+        return machine.tape, machine.execute
+    tmptape = load_tape(tape)
+    cache = InstructionCache(tmptape)
+
+    def step(curpos, relative_base, read_input):
+        return execute(tmptape, curpos, relative_base, read_input, cache)
+    return tmptape, step
+
+
+def run_tape(tape, input_values, starting_pos=0, relative_base=0, output=None, compiled=False, traced=False,
+             optimized=False, verify=False):
+    """
+    optimized=True runs the program from the start as intcode.optimizer.optimize_tape() rewrote it, ignoring
+    starting_pos and relative_base; verify=True also checks the rewrite against the original by running both first.
+    """
+    if optimized:
+        program = optimize_tape(tape)
+        if verify:
+            verify_optimization(tape, program, input_values)
+        if program.entry is None:
+            # Halted before its first I/O, so there's nothing left to run
+            return program.image, None, None, program.relative_base
+        tape, starting_pos, relative_base = program.image, program.entry, program.relative_base
+    tmptape, step = load_program(tape, compiled, traced, starting_pos or 0)
+    curpos = starting_pos
+    tape_output = None
+    read_input = QueueInput(input_values).read
+    while curpos is not None:
+        curpos, relative_base, output_value = step(curpos, relative_base, read_input)
+        # Originally I had just "if output" here, but that failed when output was legitimately 0
+        if output_value is not None:
+            if output is not None:
+                output.write(output_value)
+            tape_output = output_value
+    return tmptape, curpos, tape_output, relative_base
+
+
+def run_tape_with_output_stop(tape, input_values, starting_pos=0, relative_base=0):
+    tmptape = load_tape(tape)
+    curpos, relative_base, output_value = execute(tmptape, starting_pos, relative_base,
+                                                  QueueInput(input_values).read)
+    return tmptape, curpos, output_value, relative_base
+
+
+def run_tape_generator(tape, num_outputs=1, compiled=False, traced=False):
+    tmptape, step = load_program(tape, compiled, traced)
+    curpos = 0
+    relative_base = 0
+    program_input = QueueInput((yield))
+    output_values = []
+    while curpos is not None:
+        curpos, relative_base, output_value = step(curpos, relative_base, program_input.read)
+        if output_value is not None:
+            output_values.append(output_value)
+            if len(output_values) == num_outputs:
+                # Each send replaces whatever input the program didn't get around to reading
+                program_input = QueueInput((yield tuple(output_values)))
+                output_values = []
+
+
+def run_tape_multithreaded(tape, input_policy, output_policy, compiled=False, traced=False):
+    tmptape, step = load_program(tape, compiled, traced)
+    curpos = 0
+    relative_base = 0
+    while curpos is not None:
+        curpos, relative_base, output_value = step(curpos, relative_base, input_policy.read)
+        if output_value is not None:
+            output_policy.write(output_value)
+    return tmptape, curpos, relative_base
+
+
+def run_ascii(tape, terminal, compiled=False, traced=False):
+    """Runs tape to completion against an AsciiTerminal, and returns the terminal's non-ASCII results"""
+    run_tape_multithreaded(tape, terminal, terminal, compiled, traced)
+    terminal.flush()
+    return terminal.results
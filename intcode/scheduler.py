@@ -0,0 +1,97 @@
+from collections import defaultdict
+from intcode.io import InputExhausted
+from intcode.vm import IntcodeVM, NEEDS_INPUT, HOT_LOOP
+
+# How many times a VM may go around any one loop in a turn before the next VM gets to go
+TURN_BUDGET = 1000
+
+
+class RoundRobinScheduler(object):
+    """
+    Runs a group of VMs cooperatively in a single process, giving each one a turn in order.  A turn lasts until the
+    VM outputs, halts, goes to sleep waiting for input, or has jumped back to the same loop head turn_budget times,
+    so a VM that computes for a long time without any I/O can't hold up the others.
+
+    Polling an empty queue reads idle_value, which is how the day 23 NICs expect to be told nothing has arrived
+    (-1).  Each VM's input opcode keeps count of how many times in a row it has done that; receiving real input or
+    outputting starts the count over.  Once it reaches idle_threshold, the VM pauses in front of the input
+    instruction instead, with its status at NEEDS_INPUT, and gets no more turns until send() gives it something.
+    A network where every VM is asleep (or halted) is idle.
+
+    Every message_length outputs from a VM become one message_type message, returned by run_round() as
+    (sender, message).  Turns always run in the same order, so the same inputs always give the same run.
+    """
+    def __init__(self, vms, idle_value=-1, message_length=1, message_type=tuple, idle_threshold=2,
+                 turn_budget=TURN_BUDGET):
+        self.vms = vms
+        self.idle_value = idle_value
+        self.message_length = message_length
+        self.message_type = message_type
+        self.idle_threshold = idle_threshold
+        self.turn_budget = turn_budget
+        self.loop_counts = defaultdict(self.reset_count)
+        self.buffers = [[] for _ in vms]
+        self.empty_polls = [0] * len(vms)
+        self.current = None
+        self.current_address = None
+
+    @classmethod
+    def from_program(cls, tape, num_vms, **kwargs):
+        """One VM per address in range(num_vms), each started with its own address as its first input"""
+        ready = IntcodeVM(tape).snapshot()
+        vms = []
+        for address in range(num_vms):
+            vm = ready.fork()
+            vm.feed([address])
+            vms.append(vm)
+        return cls(vms, **kwargs)
+
+    def reset_count(self):
+        return -self.turn_budget
+
+    def send(self, address, values):
+        self.empty_polls[address] = 0
+        self.vms[address].feed(values)
+
+    def read_input(self):
+        queue = self.current.input.queue
+        if queue:
+            self.empty_polls[self.current_address] = 0
+            return queue.popleft()
+        self.empty_polls[self.current_address] += 1
+        if self.empty_polls[self.current_address] >= self.idle_threshold:
+            raise InputExhausted
+        return self.idle_value
+
+    def run_turn(self, address):
+        """Gives the VM at address one turn, and returns the message it finished during it, if any"""
+        vm = self.vms[address]
+        self.current = vm
+        self.current_address = address
+        # Every turn gets a fresh budget
+        self.loop_counts.clear()
+        output_value = vm.execute(self.read_input, self.loop_counts)
+        if output_value is None or output_value is NEEDS_INPUT or output_value is HOT_LOOP:
+            return None
+        self.empty_polls[address] = 0
+        buffer = self.buffers[address]
+        buffer.append(output_value)
+        if len(buffer) < self.message_length:
+            return None
+        self.buffers[address] = []
+        return self.message_type(*buffer)
+
+    def run_round(self):
+        """Gives every VM with work to do one turn, and returns the (sender, message) pairs that came out of it"""
+        messages = []
+        for address, vm in enumerate(self.vms):
+            if vm.waiting:
+                continue
+            message = self.run_turn(address)
+            if message is not None:
+                messages.append((address, message))
+        return messages
+
+    @property
+    def idle(self):
+        return all(vm.waiting for vm in self.vms)
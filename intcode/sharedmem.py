@@ -0,0 +1,58 @@
+from array import array
+from multiprocessing import shared_memory
+from intcode.vm import IntcodeVM
+
+# Program words go into shared memory as native int64s
+WORD_FORMAT = "q"
+
+
+class SharedProgram(object):
+    """
+    A parsed program published once into multiprocessing.shared_memory as int64 words, so a pool of worker processes
+    can all map the same image instead of each being sent its own pickled copy.  Hand name and length to the
+    workers and have them call load_shared_program().
+
+    What this saves is the pickling and piping of the image, not memory.  There's no copy-on-write overlay over the
+    block: execute() needs a plain list to index, so every worker copies the program out of the block once when it
+    loads it, and resident memory still grows with the number of workers.
+
+    The process that creates it owns the block; use it as a context manager (or call close()) to unlink it once
+    the workers are done with it.
+    """
+    def __init__(self, tape):
+        words = array(WORD_FORMAT, tape)
+        self.length = len(words)
+        self.block = shared_memory.SharedMemory(create=True, size=max(len(words) * words.itemsize, 1))
+        self.block.buf[:len(words) * words.itemsize] = words.tobytes()
+
+    @property
+    def name(self):
+        return self.block.name
+
+    def close(self):
+        self.block.close()
+        self.block.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+def load_shared_program(name, length):
+    """
+    Maps the SharedProgram called name read-only and returns an IntcodeVM for it.  The VM's memory is the worker's
+    own copy, read straight out of the shared block, so whatever the program writes stays private to the worker.
+    """
+    # Pool workers share the publisher's resource tracker, so attaching here doesn't hand them ownership of the block
+    block = shared_memory.SharedMemory(name=name)
+    view = block.buf.toreadonly()
+    words = view.cast(WORD_FORMAT)
+    try:
+        # IntcodeVM copies whatever it's given, so hand it the block itself rather than building a list to be copied
+        return IntcodeVM(words[:length])
+    finally:
+        words.release()
+        view.release()
+        block.close()
@@ -0,0 +1,65 @@
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from itertools import islice
+from multiprocessing import Event
+from intcode.sharedmem import SharedProgram, load_shared_program
+
+SWEEP_CHUNK_SIZE = 250
+
+# Per-worker state, set up once by init_sweep_worker
+worker_program = None
+worker_found = None
+
+
+def init_sweep_worker(program_name, program_length, found):
+    global worker_program, worker_found
+    worker_program = load_shared_program(program_name, program_length).snapshot()
+    worker_found = found
+
+
+def try_patches(chunk, predicate):
+    for patches in chunk:
+        # Another worker already has an answer, so don't bother with the rest
+        if worker_found.is_set():
+            return None
+        vm = worker_program.fork()
+        for address, value in patches.items():
+            vm.write(address, value)
+        vm.run()
+        if predicate(vm.memory):
+            worker_found.set()
+            return patches
+    return None
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def sweep(tape, patch_sets, predicate, max_workers=None, chunk_size=SWEEP_CHUNK_SIZE):
+    """
+    Runs tape once per {address: value} dict in patch_sets, with those addresses overwritten before it starts, and
+    returns the first patch set whose final memory satisfies predicate(memory), or None if none of them do.
+
+    The work is split into chunk_size chunks across a ProcessPoolExecutor.  The program is published once as a
+    SharedProgram; each worker maps it when it starts and forks its own copy for every attempt.  Once any worker
+    finds a match, the others stop at their next attempt and pending chunks are cancelled, so with several matches
+    you get whichever was found first, not necessarily the earliest in patch_sets.  predicate has to be picklable: a
+    module-level function or a functools.partial of one.
+    """
+    found = Event()
+    with SharedProgram(tape) as program, \
+            ProcessPoolExecutor(max_workers, initializer=init_sweep_worker,
+                                initargs=(program.name, program.length, found)) as executor:
+        pending = {executor.submit(try_patches, chunk, predicate) for chunk in chunked(patch_sets, chunk_size)}
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.result() is not None:
+                        return future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+    return None
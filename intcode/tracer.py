@@ -0,0 +1,201 @@
+from copy import copy
+from pathlib import Path
+import sys
+import numpy as np
+from intcode.opcodes import OPCODES, pretty_print_instruction, disassembly_tape
+from intcode.decode import InstructionCache
+from intcode.io import QueueInput
+from intcode.profiler import zeroed_counters
+from intcode.vm import IntcodeVM, dispatch_loop
+
+TRACE_CAPACITY = 1 << 20
+TRACE_CHUNK_SIZE = 4096
+# Columns of a trace entry
+IP = 0
+OPCODE = 1
+RELATIVE_BASE = 2
+WRITE_ADDRESS = 3
+WRITE_VALUE = 4
+TRACE_FIELDS = 5
+# Write address for instructions that don't write to memory
+NO_WRITE = -1
+
+
+class TraceRing(object):
+    """
+    The last capacity instructions a program ran, as rows of (ip, opcode, relative_base, write address, write value)
+    in a fixed-size int64 NumPy array that wraps around.  relative_base is the value the instruction ran with.
+    Instructions that don't write to memory have NO_WRITE as their write address; for outputs the write value is
+    the value output, and for everything else it's 0.
+
+    Setting NumPy elements one at a time is slow, so execute_traced() fills plain array('q') staging columns instead,
+    and they're copied into the ring chunk_size entries at a time.  entries() flushes whatever is still staged.
+    """
+    def __init__(self, capacity=TRACE_CAPACITY, chunk_size=TRACE_CHUNK_SIZE):
+        self.capacity = capacity
+        self.chunk_size = chunk_size
+        self.ring = np.zeros((capacity, TRACE_FIELDS), dtype=np.int64)
+        # Total number of entries ever flushed into the ring
+        self.count = 0
+        self.columns = [zeroed_counters(chunk_size) for _ in range(TRACE_FIELDS)]
+        self.staged = 0
+
+    def flush(self):
+        staged = self.staged
+        if not staged:
+            return
+        chunk = np.column_stack([np.frombuffer(column, dtype=np.int64, count=staged) for column in self.columns])
+        self.staged = 0
+        kept = chunk[-self.capacity:]
+        start = (self.count + staged - len(kept)) % self.capacity
+        first = min(len(kept), self.capacity - start)
+        self.ring[start:start + first] = kept[:first]
+        self.ring[:len(kept) - first] = kept[first:]
+        self.count += staged
+
+    def entries(self):
+        """Everything still in the ring, oldest first"""
+        self.flush()
+        if self.count <= self.capacity:
+            return self.ring[:self.count].copy()
+        start = self.count % self.capacity
+        return np.concatenate((self.ring[start:], self.ring[:start]))
+
+    def save(self, path):
+        np.save(path, self.entries())
+
+
+def decode_trace(entries, tape):
+    """
+    Renders trace entries (from TraceRing.entries() or a file it saved) one line each, disassembling every
+    instruction with pretty_print_instruction against tape.  The trace doesn't keep instruction operands, so pass
+    the program as it was when those instructions ran; entries whose opcode doesn't match what tape has at that
+    address are flagged.
+    """
+    memory = disassembly_tape(tape)
+    lines = []
+    for ip, opcode, relative_base, write_address, write_value in np.asarray(entries).tolist():
+        if memory[ip] % 100 == opcode:
+            instruction = OPCODES[opcode](memory, ip, None, relative_base=relative_base)
+            line = pretty_print_instruction(instruction, print_index=True, print_relbase=True)
+        else:
+            line = f"{ip:05d} [R{relative_base:5}] {OPCODES[opcode].pretty_name:10} <code has changed since>"
+        if write_address != NO_WRITE:
+            line += f"  -> [{write_address}] = {write_value}"
+        elif opcode == 4:
+            line += f"  -> output {write_value}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+execute_traced = dispatch_loop("execute_traced", """
+    intcode.vm.execute() with every instruction it completes recorded into trace, a TraceRing.  A cache passed in must
+    not use superinstructions, so each instruction gets its own entry.
+    """, params="trace", setup="""
+if cache is None:
+    cache = InstructionCache(tape, superinstructions=False)
+ips, opcodes, bases, addresses, values = trace.columns
+chunk_size = trace.chunk_size
+staged = trace.staged
+""", instruction="""
+ips[staged] = curpos
+opcodes[staged] = opcode
+bases[staged] = relative_base
+addresses[staged] = NO_WRITE
+values[staged] = 0
+""", write="""
+addresses[staged] = {operand}
+values[staged] = value
+""", output="""
+values[staged] = first
+""", done="""
+staged += 1
+if staged == chunk_size:
+    trace.staged = staged
+    trace.flush()
+    staged = 0
+""", cleanup="""
+# Keep whatever was staged even if the program crashed, since that's when a trace is most useful
+trace.staged = staged
+""", namespace={"NO_WRITE": NO_WRITE})
+
+
+class TracedVM(IntcodeVM):
+    """
+    An IntcodeVM whose trace attribute is a TraceRing holding the last capacity instructions it ran.
+
+    Recording each instruction as it runs costs more than running it, so the VM runs at full speed through the
+    plain interpreter and only keeps a journal of what came from outside: the values each execute() call read, the
+    loop counters it was given, and any write() calls.  The interpreter is deterministic, so replaying the journal
+    through execute_traced() from the original program runs exactly the same instructions, and that's when the ring
+    gets filled.  The journal grows with the number of calls and inputs rather than with instructions run.  Reading
+    trace replays the whole run, and the result is kept until the VM runs some more.
+    """
+    def __init__(self, tape, curpos=0, relative_base=0, capacity=TRACE_CAPACITY):
+        super().__init__(tape, curpos, relative_base)
+        self.program = list(tape)
+        self.start = (curpos, relative_base)
+        self.capacity = capacity
+        # ("execute", loop_counts, values read) and ("write", address, value), in the order they happened
+        self.journal = []
+        # (journal length, TraceRing) from the last replay
+        self.replayed = None
+
+    def execute(self, read_input, loop_counts=None):
+        if self.curpos is None:
+            return None
+        values = []
+
+        def journaled_input():
+            value = read_input()
+            values.append(value)
+            return value
+
+        # The interpreter counts on loop_counts as it goes, so the replay needs them as they were at the start
+        self.journal.append(("execute", copy(loop_counts), values))
+        return super().execute(journaled_input, loop_counts)
+
+    def write(self, address, value):
+        super().write(address, value)
+        self.journal.append(("write", address, value))
+
+    @property
+    def trace(self):
+        if self.replayed is None or self.replayed[0] != len(self.journal):
+            self.replayed = (len(self.journal), self.replay())
+        return self.replayed[1]
+
+    def replay(self):
+        """Runs the journal again from the original program through execute_traced(), and returns the TraceRing"""
+        trace = TraceRing(self.capacity)
+        vm = IntcodeVM(self.program, *self.start)
+        vm.cache = InstructionCache(vm.memory, superinstructions=False)
+        for position, (kind, first, second) in enumerate(self.journal):
+            if kind == "write":
+                vm.write(first, second)
+                continue
+            try:
+                vm.curpos, vm.relative_base, _ = execute_traced(vm.memory, vm.curpos, vm.relative_base,
+                                                                QueueInput(second).read, vm.cache, copy(first),
+                                                                pause_on_input=True, trace=trace)
+            except Exception:
+                # Only the last call can have crashed, and the trace up to the crash is what's wanted from it
+                if position != len(self.journal) - 1:
+                    raise
+        return trace
+
+    def decode(self, last=None):
+        """The last entries in the trace (all of them by default), decoded against the original program"""
+        entries = self.trace.entries()
+        if last is not None:
+            entries = entries[-last:]
+        return decode_trace(entries, self.program)
+
+
+if __name__ == '__main__':
+    # python -m intcode.tracer inputs/advent2019_day09_input.txt trace.npy [last]
+    PROGRAM = [int(x) for x in Path(sys.argv[1]).read_text().split(",")]
+    ENTRIES = np.load(sys.argv[2])
+    if len(sys.argv) > 3:
+        ENTRIES = ENTRIES[-int(sys.argv[3]):]
+    print(decode_trace(ENTRIES, PROGRAM))
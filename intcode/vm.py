@@ -0,0 +1,462 @@
+import ast
+import inspect
+import linecache
+from intcode.opcodes import MODE_POSITION, MODE_RELATIVE
+from intcode.decode import InstructionCache, INSTRUCTION_LENGTHS
+from intcode.io import InputExhausted, QueueInput
+from intcode.memory import load_tape, memory_pages, load_pages, negative_address
+
+
+class HotLoop(object):
+    # Returned by execute() in place of an output value when a loop counter in loop_counts comes due
+    pass
+
+
+HOT_LOOP = HotLoop()
+
+
+class VMStatus(object):
+    """What an IntcodeVM is doing between calls.  NEEDS_INPUT doubles as execute()'s return value for a pause."""
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return self.name
+
+
+# Can carry on without anything from outside
+RUNNING = VMStatus("RUNNING")
+# Paused in front of an input instruction, with nothing queued
+NEEDS_INPUT = VMStatus("NEEDS_INPUT")
+# Just output a value, which is in the VM's output attribute
+OUTPUT_READY = VMStatus("OUTPUT_READY")
+HALTED = VMStatus("HALTED")
+
+
+def execute(tape, curpos, relative_base, read_input, cache=None, loop_counts=None, pause_on_input=False):
+    """
+    Runs the tape from curpos until it either outputs a value or halts, without building an OpCodeBase per step.
+    Instructions come pre-split from an InstructionCache, so only the operand dereferences happen per visit.
+    read_input is called with no arguments whenever an input instruction runs.
+    Pass the same cache back in on every call against a given tape so loops stay decoded between outputs.
+
+    The tape is a plain list.  Accesses past its end raise IndexError before the instruction has any side effects,
+    at which point memory is grown to fit and the instruction runs again.
+
+    Returns (curpos, relative_base, output_value).  curpos is None once the program has halted.
+
+    loop_counts is for intcode.jit: a mapping of address -> counter, bumped every time a jump goes backwards to that
+    address.  Once a counter reaches zero, execute stops at the jump target and returns HOT_LOOP as the output value.
+
+    With pause_on_input set, an InputExhausted from read_input stops execute in front of the input instruction
+    and it returns NEEDS_INPUT as the output value, so calling it again later retries the read.
+
+    The "# hook:" comments mark where dispatch_loop() puts the code for instrumented copies of this function.
+    """
+    if cache is None:
+        cache = InstructionCache(tape)
+    if curpos < 0:
+        raise negative_address(curpos)
+    records = cache.records
+    code_cells = cache.code_cells
+    while True:
+        try:
+            while True:
+                record = records[curpos]
+                if record is None:
+                    record = cache.decode(curpos)
+                opcode, first_mode, first, second_mode, second, third_mode, third, jump_target = record
+                # hook: instruction
+                if opcode == 1 or opcode == 2 or opcode == 7 or opcode == 8:
+                    if first_mode == MODE_POSITION:
+                        first = tape[first]
+                    elif first_mode == MODE_RELATIVE:
+                        first += relative_base
+                        if first < 0:
+                            raise negative_address(first)
+                        first = tape[first]
+                    if second_mode == MODE_POSITION:
+                        second = tape[second]
+                    elif second_mode == MODE_RELATIVE:
+                        second += relative_base
+                        if second < 0:
+                            raise negative_address(second)
+                        second = tape[second]
+                    if third_mode == MODE_RELATIVE:
+                        third += relative_base
+                        if third < 0:
+                            raise negative_address(third)
+                    if opcode == 1:
+                        value = first + second
+                    elif opcode == 2:
+                        value = first * second
+                    elif opcode == 7:
+                        value = 1 if first < second else 0
+                    else:
+                        value = 1 if first == second else 0
+                    tape[third] = value
+                    # hook: write third
+                    if code_cells[third] is not None:
+                        cache.invalidate(third)
+                    curpos += 4
+                elif opcode > 99:
+                    # Superinstruction from intcode.peephole: arithmetic immediately followed by a jump on its result
+                    if first_mode == MODE_POSITION:
+                        first = tape[first]
+                    elif first_mode == MODE_RELATIVE:
+                        first += relative_base
+                        if first < 0:
+                            raise negative_address(first)
+                        first = tape[first]
+                    if second_mode == MODE_POSITION:
+                        second = tape[second]
+                    elif second_mode == MODE_RELATIVE:
+                        second += relative_base
+                        if second < 0:
+                            raise negative_address(second)
+                        second = tape[second]
+                    if third_mode == MODE_RELATIVE:
+                        third += relative_base
+                        if third < 0:
+                            raise negative_address(third)
+                    opcode -= 100
+                    if opcode < 20:
+                        value = first + second
+                    elif opcode < 30:
+                        value = first * second
+                    elif opcode < 80:
+                        value = 1 if first < second else 0
+                    else:
+                        value = 1 if first == second else 0
+                    tape[third] = value
+                    # hook: write third
+                    if code_cells[third] is not None:
+                        # The write may have changed the jump, so carry on from it as a separate instruction
+                        cache.invalidate(third)
+                        curpos += 4
+                    else:
+                        opcode %= 10
+                        if opcode == 0 or (value != 0) == (opcode == 5):
+                            # Same loop counting as a plain jump, which sits 4 words in
+                            if jump_target < curpos + 4:
+                                if jump_target < 0:
+                                    raise negative_address(jump_target)
+                                # hook: backward_jump jump_target
+                                if loop_counts is not None:
+                                    count = loop_counts[jump_target] + 1
+                                    loop_counts[jump_target] = count
+                                    if count >= 0:
+                                        # hook: done
+                                        return jump_target, relative_base, HOT_LOOP
+                            curpos = jump_target
+                        else:
+                            curpos += 7
+                elif opcode == 5 or opcode == 6:
+                    if first_mode == MODE_POSITION:
+                        first = tape[first]
+                    elif first_mode == MODE_RELATIVE:
+                        first += relative_base
+                        if first < 0:
+                            raise negative_address(first)
+                        first = tape[first]
+                    if (first != 0) == (opcode == 5):
+                        if second_mode == MODE_POSITION:
+                            second = tape[second]
+                        elif second_mode == MODE_RELATIVE:
+                            second += relative_base
+                            if second < 0:
+                                raise negative_address(second)
+                            second = tape[second]
+                        if second < curpos:
+                            if second < 0:
+                                raise negative_address(second)
+                            # hook: backward_jump second
+                            if loop_counts is not None:
+                                count = loop_counts[second] + 1
+                                loop_counts[second] = count
+                                if count >= 0:
+                                    # hook: done
+                                    return second, relative_base, HOT_LOOP
+                        curpos = second
+                    else:
+                        curpos += 3
+                elif opcode == 9:
+                    if first_mode == MODE_POSITION:
+                        first = tape[first]
+                    elif first_mode == MODE_RELATIVE:
+                        first += relative_base
+                        if first < 0:
+                            raise negative_address(first)
+                        first = tape[first]
+                    relative_base += first
+                    curpos += 2
+                elif opcode == 3:
+                    if first_mode == MODE_RELATIVE:
+                        first += relative_base
+                        if first < 0:
+                            raise negative_address(first)
+                    # Make sure the destination exists before consuming any input, since a retry would read again
+                    if first >= len(tape):
+                        raise IndexError
+                    try:
+                        value = read_input()
+                    except InputExhausted:
+                        if not pause_on_input:
+                            raise
+                        # hook: paused
+                        return curpos, relative_base, NEEDS_INPUT
+                    tape[first] = value
+                    # hook: write first
+                    if code_cells[first] is not None:
+                        cache.invalidate(first)
+                    curpos += 2
+                elif opcode == 4:
+                    if first_mode == MODE_POSITION:
+                        first = tape[first]
+                    elif first_mode == MODE_RELATIVE:
+                        first += relative_base
+                        if first < 0:
+                            raise negative_address(first)
+                        first = tape[first]
+                    # hook: output
+                    # hook: done
+                    return curpos + 2, relative_base, first
+                else:
+                    # decode() has already rejected unknown opcodes, so this is 99
+                    # hook: done
+                    return None, relative_base, None
+                # hook: done
+        except IndexError:
+            highest = cache.highest_address(curpos, relative_base)
+            if highest < len(tape):
+                # Nothing we touch is out of bounds, so this came from somewhere else
+                raise
+            cache.grow(highest)
+            # hook: grow
+
+
+INTERPRETER_FILENAME_PREFIX = "<intcode interpreter"
+HOOK_MARKER = "# hook: "
+
+
+def dispatch_loop(name, doc, params="", namespace=None, setup="", cleanup="", **hooks):
+    """
+    Builds an interpreter called name from the source of execute(), with doc as its docstring.  It takes the same
+    arguments as execute() plus params (keyword-only ones, written as source), and runs setup before anything else
+    (so setup can create the cache its own way) and cleanup in a finally around the rest.  The other hooks replace
+    the "# hook:" comments in execute():
+      instruction     once an instruction is decoded, before any of it runs
+      write           after a write to memory, with the address in {operand} and what was written in value
+      backward_jump   when a jump to {operand} is taken backwards, before loop_counts sees it
+      paused          before returning NEEDS_INPUT, with the input instruction still to run
+      output          before returning an output, with the value in first
+      done            once an instruction has finished, including the ones that return
+      grow            after memory has grown, before the instruction runs again
+    {operand} is the word after the hook's name in the comment.  So execute() itself has nothing extra in its loop,
+    and none of the instrumented copies can drift apart from it.  Names in the hooks are looked up in namespace,
+    falling back on this module's.
+    """
+    template = inspect.getsource(execute)
+    # Everything after the docstring, which is one level in
+    first_statement = ast.parse(template).body[0].body[1]
+    body = template.splitlines()[first_statement.lineno - 1:]
+    indent = "        " if cleanup else "    "
+    lines = []
+    for line in body:
+        stripped = line.strip()
+        if stripped.startswith(HOOK_MARKER):
+            hook, *operand = stripped[len(HOOK_MARKER):].split()
+            margin = line[:len(line) - len(line.lstrip())]
+            for hook_line in hooks.get(hook, "").strip("\n").splitlines():
+                if operand:
+                    hook_line = hook_line.replace("{operand}", operand[0])
+                lines.append(indent + margin[4:] + hook_line)
+        elif stripped:
+            lines.append(indent + line[4:])
+
+    if params:
+        params = ", *, " + params
+    source = [f"def {name}(tape, curpos, relative_base, read_input, cache=None, loop_counts=None, "
+              f"pause_on_input=False{params}):"]
+    source += ["    " + line for line in setup.strip("\n").splitlines()]
+    if cleanup:
+        source.append("    try:")
+        source += lines
+        source.append("    finally:")
+        source += ["        " + line for line in cleanup.strip("\n").splitlines()]
+    else:
+        source += lines
+    filename = f"{INTERPRETER_FILENAME_PREFIX} {name}>"
+    text = "\n".join(source) + "\n"
+    # Lets tracebacks through the generated code show its lines
+    linecache.cache[filename] = (len(text), None, text.splitlines(True), filename)
+    scope = dict(globals())
+    scope.update(namespace or {})
+    exec(compile(text, filename, "exec"), scope)
+    interpreter = scope[name]
+    interpreter.__doc__ = doc
+    return interpreter
+
+
+class VMSnapshot(object):
+    """
+    A VM's memory pages, position and relative base at the time snapshot() was called, along with its decoded
+    instructions.  The first fork that runs to a halt hands back whatever it decoded from code it didn't modify,
+    so later forks start with the whole program decoded rather than just what predecode() could find.
+    """
+    def __init__(self, pages, curpos, relative_base, records, code_cells, superinstructions=True):
+        self.pages = pages
+        self.curpos = curpos
+        self.relative_base = relative_base
+        self.records = records
+        self.code_cells = code_cells
+        self.superinstructions = superinstructions
+        self.learned = False
+
+    def fork(self):
+        memory = load_pages(self.pages)
+        cache = InstructionCache(memory, self.superinstructions, self.records[:], self.code_cells[:])
+        vm = IntcodeVM(memory, self.curpos, self.relative_base, cache)
+        vm.pages = self.pages
+        vm.origin = None if self.learned else self
+        return vm
+
+    def learn_decoding(self, vm):
+        self.learned = True
+        memory = load_pages(self.pages)
+        for index, record in enumerate(vm.cache.records[:len(memory)]):
+            if record is None or self.records[index] is not None:
+                continue
+            end = index + INSTRUCTION_LENGTHS[record[0]]
+            if vm.memory[index:end] != memory[index:end]:
+                continue
+            if any(owner is not None for owner in self.code_cells[index:end]):
+                continue
+            self.records[index] = record
+            self.code_cells[index:end] = [index] * (end - index)
+
+
+class IntcodeVM(object):
+    """
+    One running copy of a program: its memory, instruction pointer (curpos, None once halted) and relative base.
+
+    snapshot() captures all of that, plus the decoded program, and VMSnapshot.fork() starts a new VM from
+    it.  Drivers that try lots of inputs on one program run the shared startup once and fork per attempt.  Snapshots
+    store memory as pages, and a snapshot of a fork reuses every page the fork hasn't changed.  A fork gets its own
+    flat copy of memory, since execute() needs plain list indexing to stay fast.
+
+    A VM keeps its own input queue.  run() and run_until_output() add to it, and pause rather than fail when it runs
+    dry, so a VM can be resumed with more input at no more cost than the call itself.
+
+    status says where the VM got to: RUNNING, OUTPUT_READY (with the value in output), NEEDS_INPUT or HALTED.  A
+    VM stays in NEEDS_INPUT until feed() gives it something, so a scheduler can leave it alone until then.
+
+    Passing cache (an InstructionCache over tape) makes the VM run on tape itself with that decoding, rather than
+    on a fresh copy, which is how forks start.
+    """
+    def __init__(self, tape, curpos=0, relative_base=0, cache=None):
+        if cache is None:
+            self.memory = load_tape(tape)
+            self.cache = InstructionCache(self.memory)
+        else:
+            self.memory = cache.tape
+            self.cache = cache
+        self.input = QueueInput()
+        self.curpos = curpos
+        self.relative_base = relative_base
+        # Pages of the snapshot this VM was forked from, for its own snapshots to share
+        self.pages = ()
+        # Snapshot still waiting for a fork to show it the rest of the program
+        self.origin = None
+        self.status = HALTED if curpos is None else RUNNING
+        self.output = None
+
+    @property
+    def halted(self):
+        return self.curpos is None
+
+    @property
+    def waiting(self):
+        """True if the VM can't do anything until it's fed more input or it has halted"""
+        return self.status is NEEDS_INPUT or self.status is HALTED
+
+    def feed(self, values):
+        """Queues up input values, and wakes the VM if it was waiting for them"""
+        self.input.feed(values)
+        if self.status is NEEDS_INPUT and self.input.queue:
+            self.status = RUNNING
+
+    def write(self, address, value):
+        """Changes memory from outside the program, e.g. day 2's noun and verb"""
+        if address < 0 or address >= len(self.memory):
+            self.cache.grow(address)
+        self.memory[address] = value
+        if self.cache.code_cells[address] is not None:
+            self.cache.invalidate(address)
+
+    def execute(self, read_input, loop_counts=None):
+        """
+        Runs until the next output, a halt, or an input that read_input raises InputExhausted for.
+        Returns the output value, None after a halt, or NEEDS_INPUT, and sets status to match.  Given loop_counts, it
+        also stops at a loop head whose counter comes due and returns HOT_LOOP, the same as the execute() function,
+        with status left at RUNNING.
+        """
+        if self.curpos is None:
+            return None
+        self.curpos, self.relative_base, output_value = execute(self.memory, self.curpos, self.relative_base,
+                                                                read_input, self.cache, loop_counts,
+                                                                pause_on_input=True)
+        return self.finish_execute(output_value)
+
+    def finish_execute(self, output_value):
+        # Brings status up to date after a call to the interpreter, and passes its output value through
+        if output_value is HOT_LOOP:
+            self.status = RUNNING
+        elif output_value is NEEDS_INPUT:
+            self.status = NEEDS_INPUT
+        elif self.curpos is None:
+            self.status = HALTED
+            if self.origin is not None:
+                self.origin.learn_decoding(self)
+                self.origin = None
+        else:
+            self.status = OUTPUT_READY
+            self.output = output_value
+        return output_value
+
+    def run_until_output(self, input_values=()):
+        """Queues up input_values and runs until the next output, a halt or a pause for input, like execute()"""
+        self.feed(input_values)
+        return self.execute(self.input.read)
+
+    def run_until_input_or_halt(self, input_values=(), outputs=None):
+        """
+        Queues up input_values, runs until the program halts or runs out of input, and returns everything it output
+        in one go.  Outputs are appended to outputs, which can be any list or array('q') (a new list by default), so
+        a caller can reuse one buffer across calls.  status says which of the two it stopped for.
+        """
+        self.feed(input_values)
+        if outputs is None:
+            outputs = []
+        append = outputs.append
+        step = self.execute
+        read_input = self.input.read
+        while True:
+            output_value = step(read_input)
+            if self.status is not OUTPUT_READY:
+                return outputs
+            append(output_value)
+
+    def run(self, input_values=()):
+        """Same as run_until_input_or_halt(), collecting into a new list"""
+        return self.run_until_input_or_halt(input_values)
+
+    def snapshot(self):
+        if self.curpos is not None:
+            self.cache.predecode(self.curpos)
+        self.pages = memory_pages(self.memory, self.pages)
+        return VMSnapshot(self.pages, self.curpos, self.relative_base, self.cache.records[:],
+                          self.cache.code_cells[:], self.cache.superinstructions)
+
+    def fork(self):
+        return self.snapshot().fork()